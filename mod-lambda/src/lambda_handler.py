@@ -3,18 +3,107 @@
 import json
 import logging
 import os
-from typing import Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypedDict, overload
 
-import requests
+import urllib3
 
-# Configure logging
-logger = logging.getLogger()
+# Configure logging on the module logger rather than the root logger
+logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Event validation constants, built once rather than per invocation
+_VALID_STATUSES = frozenset(("in_progress", "done"))
+_MISSING = object()
+
+_SUCCESS_MESSAGE = "Widget updated successfully"
+
+# Pre-rendered request bodies for each valid status; only transitionAt varies
+_PAYLOAD_TEMPLATES = {
+    status: b'{"status":"%s","transitionAt":%%d}' % status.encode()
+    for status in _VALID_STATUSES
+}
+
+# Shared HTTP connection pool, kept for the lifetime of the execution
+# environment so warm invocations reuse the keep-alive connection to the ALB.
+# urllib3 is used directly rather than through requests: the handler makes a
+# single PUT and needs none of the session, cookie or hook machinery, and
+# urllib3 already ships with the Lambda runtime as a botocore dependency.
+_POOL: urllib3.PoolManager
+
+# Normalized "<ALB_ENDPOINT>/widgets/" prefix, resolved once per execution
+# environment since the endpoint cannot change between invocations.
+_ALB_BASE: str | None = None
+
+# Recently completed updates keyed by (widget_id, status, transitionAt). Step
+# Functions retries with identical input, so a repeat within the TTL is served
+# from here instead of re-issuing the ALB PUT.
+_RECENT_UPDATES: OrderedDict[tuple[str, str, int], tuple[float, dict[str, Any]]] = (
+    OrderedDict()
+)
+_RECENT_UPDATES_MAX = 128
+_RECENT_UPDATES_TTL_SECONDS = 60.0
+_RECENT_UPDATES_LOCK = threading.Lock()
+
+# Upper bound on concurrent ALB calls for a batched event; matches the pool size
+_BATCH_MAX_WORKERS = 8
+# Worker threads are started on demand and reused by warm invocations
+_BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=_BATCH_MAX_WORKERS)
+
+
+class BatchEvent(TypedDict):
+    """Map state ItemBatcher payload carrying a batch of update events."""
+
+    Items: list[dict[str, Any]]
+
+
+def _init() -> None:
+    """Build the per-environment state during the Lambda init phase.
+
+    Doing this work at import means SnapStart snapshots and provisioned
+    concurrency environments start with it already done. It must not create
+    unique values (random seeds, UUIDs, timestamps), since those would be
+    shared by every environment restored from a snapshot, and it only touches
+    the network for provisioned concurrency, which never snapshots.
+    """
+    global _POOL, _ALB_BASE
+    _POOL = urllib3.PoolManager(
+        num_pools=1,
+        maxsize=_BATCH_MAX_WORKERS,
+        retries=False,
+        timeout=urllib3.Timeout(connect=5, read=30),
+        headers={"Content-Type": "application/json"},
+    )
+
+    alb_endpoint = os.environ.get("ALB_ENDPOINT")
+    if alb_endpoint:
+        alb_root = alb_endpoint.rstrip("/")
+        _ALB_BASE = alb_root + "/widgets/"
+
+        # Provisioned concurrency init is not on any request's critical path,
+        # so open the ALB connection (DNS, TCP, TLS) there for the first
+        # invocation to reuse. On-demand cold starts skip this.
+        if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == (
+            "provisioned-concurrency"
+        ):
+            try:
+                _POOL.request("HEAD", alb_root + "/", timeout=2.0)
+            except urllib3.exceptions.HTTPError as e:
+                logger.warning("ALB connection warm-up failed: %s", e)
+
+
+# snapstart-safe: no unique tokens at import
+_init()
+
 
 class ModLambdaError(Exception):
     """Custom exception for mod lambda errors."""
 
+    __slots__ = ("message", "status_code")
+
     def __init__(self, message: str, status_code: int = 500) -> None:
         """Initialize ModLambdaError.
 
@@ -26,6 +115,30 @@ class ModLambdaError(Exception):
         self.message = message
         self.status_code = status_code
 
+    def __reduce__(self) -> tuple[type["ModLambdaError"], tuple[str, int]]:
+        """Keep status_code when pickled, as slots are not in __dict__."""
+        return type(self), (self.message, self.status_code)
+
+
+def _get_alb_base() -> str:
+    """Return the widgets URL prefix derived from ALB_ENDPOINT.
+
+    Returns:
+        The ALB endpoint without a trailing slash, followed by "/widgets/"
+
+    Raises:
+        ModLambdaError: If ALB_ENDPOINT is not set
+    """
+    global _ALB_BASE
+    if _ALB_BASE is None:
+        alb_endpoint = os.environ.get("ALB_ENDPOINT")
+        if not alb_endpoint:
+            raise ModLambdaError(
+                "ALB_ENDPOINT environment variable not set", 500
+            )
+        _ALB_BASE = alb_endpoint.rstrip("/") + "/widgets/"
+    return _ALB_BASE
+
 
 def validate_event(event: dict[str, Any]) -> dict[str, Any]:
     """Validate the Step Functions event structure.
@@ -39,38 +152,43 @@ def validate_event(event: dict[str, Any]) -> dict[str, Any]:
     Raises:
         ModLambdaError: If validation fails
     """
-    required_fields = ["widget_id", "status", "transitionAt"]
+    widget_id = event.get("widget_id", _MISSING)
+    if widget_id is _MISSING:
+        raise ModLambdaError("Missing required field: widget_id", 400)
 
-    for field in required_fields:
-        if field not in event:
-            raise ModLambdaError(f"Missing required field: {field}", 400)
+    status = event.get("status", _MISSING)
+    if status is _MISSING:
+        raise ModLambdaError("Missing required field: status", 400)
 
-    widget_id = event["widget_id"]
-    status = event["status"]
-    transition_at = event["transitionAt"]
+    transition_at = event.get("transitionAt", _MISSING)
+    if transition_at is _MISSING:
+        raise ModLambdaError("Missing required field: transitionAt", 400)
 
-    if not isinstance(widget_id, str) or not widget_id.strip():
+    if type(widget_id) is not str:
+        raise ModLambdaError("widget_id must be a non-empty string", 400)
+    widget_id = widget_id.strip()
+    if not widget_id:
         raise ModLambdaError("widget_id must be a non-empty string", 400)
 
-    if status not in ["in_progress", "done"]:
+    if not isinstance(status, str) or status not in _VALID_STATUSES:
         raise ModLambdaError(
             "status must be either 'in_progress' or 'done'", 400
         )
 
-    if not isinstance(transition_at, int | float) or transition_at < 0:
+    if not isinstance(transition_at, (int, float)) or transition_at < 0:
         raise ModLambdaError(
             "transitionAt must be a non-negative number (epoch seconds)", 400
         )
 
     return {
-        "widget_id": widget_id.strip(),
+        "widget_id": widget_id,
         "status": status,
         "transitionAt": int(transition_at),
     }
 
 
 def update_widget_via_alb(
-    widget_id: str, status: str, transition_at: int, alb_endpoint: str
+    widget_id: str, status: str, transition_at: int
 ) -> dict[str, Any]:
     """Update widget via ALB REST API.
 
@@ -78,7 +196,6 @@ def update_widget_via_alb(
         widget_id: The widget ID to update
         status: The new status value
         transition_at: The new transitionAt epoch seconds value
-        alb_endpoint: The ALB endpoint URL
 
     Returns:
         Response from the ALB API
@@ -86,111 +203,275 @@ def update_widget_via_alb(
     Raises:
         ModLambdaError: If the API call fails
     """
-    url = f"{alb_endpoint.rstrip('/')}/widgets/{widget_id}"
+    url = _get_alb_base() + widget_id
+
+    template = _PAYLOAD_TEMPLATES.get(status)
+    if template is not None:
+        payload = template % transition_at
+    else:
+        payload = json.dumps(
+            {"status": status, "transitionAt": transition_at}, separators=(",", ":")
+        ).encode()
+
+    logger.info(
+        "Updating widget via ALB widget_id=%s status=%s transitionAt=%s url=%s",
+        widget_id,
+        status,
+        transition_at,
+        url,
+    )
 
-    payload = {
-        "status": status,
-        "transitionAt": transition_at,
-    }
+    try:
+        response = _POOL.request("PUT", url, body=payload)
+    except urllib3.exceptions.HTTPError as e:
+        # NewConnectionError subclasses ConnectTimeoutError, so it must be
+        # classified before the generic timeout check
+        if isinstance(
+            e,
+            (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ProtocolError),
+        ):
+            raise ModLambdaError("Failed to connect to ALB API", 502) from None
+        if isinstance(e, urllib3.exceptions.TimeoutError):
+            raise ModLambdaError("ALB API request timed out", 504) from None
+        raise ModLambdaError(f"ALB API request failed: {str(e)}", 500) from e
 
-    headers = {
-        "Content-Type": "application/json",
-    }
+    body = response.data
 
-    try:
+    # Decoding the body is not free, so only do it when it will be logged
+    if logger.isEnabledFor(logging.INFO):
         logger.info(
-            "Updating widget via ALB",
-            extra={
-                "widget_id": widget_id,
-                "status": status,
-                "transitionAt": transition_at,
-                "url": url,
-            },
+            "ALB API response status_code=%s body=%s",
+            response.status,
+            body.decode("utf-8", "replace"),
         )
 
-        response = requests.put(
-            url, json=payload, headers=headers, timeout=30
+    if response.status >= 400:
+        raise ModLambdaError(
+            f"ALB API request failed with status {response.status}: "
+            f"{body.decode('utf-8', 'replace')}",
+            response.status,
         )
 
-        logger.info(
-            "ALB API response",
-            extra={
-                "status_code": response.status_code,
-                "response_body": response.text,
-            },
-        )
+    if not body:
+        return {}
 
-        if response.status_code >= 400:
-            raise ModLambdaError(
-                f"ALB API request failed with status {response.status_code}: "
-                f"{response.text}",
-                response.status_code,
-            )
+    try:
+        parsed = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        logger.warning("ALB API returned non-JSON response")
+        return {}
 
-        return response.json() if response.text else {}
+    if not isinstance(parsed, dict):
+        raise ModLambdaError("ALB API returned a non-object JSON response", 502)
+    return parsed
 
-    except requests.exceptions.Timeout:
-        raise ModLambdaError("ALB API request timed out", 504) from None
-    except requests.exceptions.ConnectionError:
-        raise ModLambdaError("Failed to connect to ALB API", 502) from None
-    except (requests.exceptions.JSONDecodeError, json.JSONDecodeError, ValueError):
-        logger.warning("ALB API returned non-JSON response or raised ValueError")
-        return {}
-    except requests.exceptions.RequestException as e:
-        raise ModLambdaError(f"ALB API request failed: {str(e)}", 500) from e
 
+def _get_recent_update(key: tuple[str, str, int]) -> dict[str, Any] | None:
+    """Return the cached response for a recently completed update.
 
-def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
-    """Lambda handler for Step Functions widget modification.
+    Args:
+        key: The (widget_id, status, transitionAt) tuple of the update
+
+    Returns:
+        The cached success response, or None if absent or expired
+    """
+    with _RECENT_UPDATES_LOCK:
+        entry = _RECENT_UPDATES.get(key)
+        if entry is None:
+            return None
+
+        stored_at, response = entry
+        if time.monotonic() - stored_at > _RECENT_UPDATES_TTL_SECONDS:
+            del _RECENT_UPDATES[key]
+            return None
+
+    return {"statusCode": response["statusCode"], "body": dict(response["body"])}
+
+
+def _remember_update(key: tuple[str, str, int], response: dict[str, Any]) -> None:
+    """Cache a successful update response, evicting the oldest entries.
 
     Args:
-        event: Step Functions event containing widget_id, status, and transitionAt
-        context: Lambda context (unused)
+        key: The (widget_id, status, transitionAt) tuple of the update
+        response: The success response returned to Step Functions
+    """
+    with _RECENT_UPDATES_LOCK:
+        _RECENT_UPDATES[key] = (time.monotonic(), response)
+        _RECENT_UPDATES.move_to_end(key)
+        while len(_RECENT_UPDATES) > _RECENT_UPDATES_MAX:
+            _RECENT_UPDATES.popitem(last=False)
+
+
+def process_event(event: dict[str, Any]) -> dict[str, Any]:
+    """Validate a single widget update event and apply it via the ALB.
+
+    Args:
+        event: Event containing widget_id, status, and transitionAt
 
     Returns:
         Success response with updated widget data
 
     Raises:
-        ModLambdaError: If processing fails
+        ModLambdaError: If validation or the ALB call fails
+    """
+    # Fail fast if the ALB endpoint is not configured
+    _get_alb_base()
+
+    # Validate the event
+    validated_data = validate_event(event)
+    widget_id = validated_data["widget_id"]
+    status = validated_data["status"]
+    transition_at = validated_data["transitionAt"]
+
+    # Serve Step Functions retries of an update that already succeeded
+    key = (widget_id, status, transition_at)
+    cached_response = _get_recent_update(key)
+    if cached_response is not None:
+        logger.info(
+            "Skipping repeated widget update widget_id=%s status=%s",
+            widget_id,
+            status,
+        )
+        return cached_response
+
+    # Update widget via ALB
+    result = update_widget_via_alb(widget_id, status, transition_at)
+
+    success_response = {
+        "statusCode": 200,
+        "body": {
+            "message": _SUCCESS_MESSAGE,
+            "widget_id": widget_id,
+            "status": status,
+            "transitionAt": transition_at,
+            "alb_response": result,
+        },
+    }
+
+    _remember_update(key, success_response)
+
+    logger.info(
+        "Widget update completed successfully widget_id=%s status=%s",
+        widget_id,
+        status,
+    )
+    return success_response
+
+
+def _process_batch_item(event: dict[str, Any]) -> dict[str, Any]:
+    """Process one event of a batch, reporting failures in the result.
+
+    Args:
+        event: Event containing widget_id, status, and transitionAt
+
+    Returns:
+        Success response, or an error response carrying the failure status code
     """
     try:
-        logger.info("Processing Step Functions event", extra={"event": event})
+        return process_event(event)
+    except ModLambdaError as e:
+        return {"statusCode": e.status_code, "body": {"error": e.message}}
+    except Exception as e:
+        logger.error("Unexpected error processing batch item: %s", e)
+        return {"statusCode": 500, "body": {"error": f"Unexpected error: {str(e)}"}}
 
-        # Get ALB endpoint from environment
-        alb_endpoint = os.environ.get("ALB_ENDPOINT")
-        if not alb_endpoint:
-            raise ModLambdaError(
-                "ALB_ENDPOINT environment variable not set", 500
-            )
 
-        # Validate the event
+def _update_key(event: dict[str, Any]) -> tuple[str, str, int] | None:
+    """Return the recent-update cache key of an event.
+
+    Args:
+        event: Event containing widget_id, status, and transitionAt
+
+    Returns:
+        The (widget_id, status, transitionAt) tuple, or None if the event is
+        invalid
+    """
+    try:
         validated_data = validate_event(event)
+    except Exception:
+        # Processing the event reports why it is invalid
+        return None
+    return (
+        validated_data["widget_id"],
+        validated_data["status"],
+        validated_data["transitionAt"],
+    )
+
+
+def process_batch(events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Apply a batch of widget update events concurrently.
+
+    The ALB calls are I/O bound, so they are issued from a small thread pool
+    sharing the module connection pool. Identical updates in the batch are
+    applied once, since concurrent workers would all miss the recent-update
+    cache before any of them fills it.
+
+    Args:
+        events: Events each containing widget_id, status, and transitionAt
+
+    Returns:
+        One response per event, in input order
+    """
+    unique_events: list[dict[str, Any]] = []
+    slots: list[int] = []
+    seen: dict[tuple[str, str, int], int] = {}
+    for event in events:
+        key = _update_key(event)
+        slot = seen.get(key) if key is not None else None
+        if slot is None:
+            slot = len(unique_events)
+            unique_events.append(event)
+            if key is not None:
+                seen[key] = slot
+        slots.append(slot)
+
+    responses = list(_BATCH_EXECUTOR.map(_process_batch_item, unique_events))
+    return [responses[slot] for slot in slots]
+
+
+@overload
+def lambda_handler(
+    event: list[dict[str, Any]] | BatchEvent, context: Any
+) -> list[dict[str, Any]]: ...
 
-        # Update widget via ALB
-        result = update_widget_via_alb(
-            validated_data["widget_id"],
-            validated_data["status"],
-            validated_data["transitionAt"],
-            alb_endpoint,
-        )
 
-        success_response = {
-            "statusCode": 200,
-            "body": {
-                "message": "Widget updated successfully",
-                "widget_id": validated_data["widget_id"],
-                "status": validated_data["status"],
-                "transitionAt": validated_data["transitionAt"],
-                "alb_response": result,
-            },
-        }
+@overload
+def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]: ...
 
-        logger.info("Widget update completed successfully", extra=success_response)
-        return success_response
 
+def lambda_handler(event: Any, context: Any) -> dict[str, Any] | list[dict[str, Any]]:
+    """Lambda handler for Step Functions widget modification.
+
+    Accepts either a single event, or a batch given as a list of events or as
+    a Map state ItemBatcher payload ({"Items": [...]}).
+
+    Args:
+        event: Step Functions event containing widget_id, status, and
+            transitionAt, or a batch of such events
+        context: Lambda context (unused)
+
+    Returns:
+        Success response with updated widget data, or one response per event
+        (including error responses) for a batch
+
+    Raises:
+        ModLambdaError: If the event is neither an object nor a list, or
+            processing a single event fails
+    """
+    logger.debug("Processing Step Functions event: %s", event)
+
+    if isinstance(event, list):
+        return process_batch(event)
+    if not isinstance(event, dict):
+        raise ModLambdaError("Event must be an object", 400)
+    if isinstance(event.get("Items"), list):
+        return process_batch(event["Items"])
+
+    try:
+        return process_event(event)
     except ModLambdaError:
         # Re-raise custom errors to bubble up to Step Functions
         raise
     except Exception as e:
-        logger.error("Unexpected error processing event", extra={"error": str(e)})
+        logger.error("Unexpected error processing event: %s", e)
         raise ModLambdaError(f"Unexpected error: {str(e)}", 500) from e
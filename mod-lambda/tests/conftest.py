@@ -0,0 +1,29 @@
+"""Shared fixtures for mod lambda tests."""
+
+from collections import OrderedDict
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def alb_endpoint(monkeypatch: pytest.MonkeyPatch) -> str:
+    """Configure ALB_ENDPOINT for every test."""
+    endpoint = "https://test-alb.com"
+    monkeypatch.setenv("ALB_ENDPOINT", endpoint)
+    return endpoint
+
+
+@pytest.fixture(autouse=True)
+def reset_module_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Clear per-environment caches so each test starts cold."""
+    monkeypatch.setattr("src.lambda_handler._ALB_BASE", None)
+    monkeypatch.setattr("src.lambda_handler._RECENT_UPDATES", OrderedDict())
+
+
+@pytest.fixture
+def mock_pool(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Replace the shared urllib3 pool with a mock."""
+    pool = MagicMock()
+    monkeypatch.setattr("src.lambda_handler._POOL", pool)
+    return pool
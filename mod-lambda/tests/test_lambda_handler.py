@@ -1,20 +1,39 @@
 """Tests for mod lambda handler."""
 
+import io
 import json
 import os
+import pickle
+from collections.abc import Callable
+from typing import Any
 from unittest.mock import MagicMock, patch
 
 import pytest
-import responses
+from urllib3 import HTTPResponse, Retry
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    LocationParseError,
+    NewConnectionError,
+    ProtocolError,
+    ReadTimeoutError,
+)
 
+import src.lambda_handler as lambda_handler_module
 from src.lambda_handler import (
     ModLambdaError,
+    _get_alb_base,
+    _init,
     lambda_handler,
     update_widget_via_alb,
     validate_event,
 )
 
 
+def alb_response(body: bytes = b"", status: int = 200) -> HTTPResponse:
+    """Build a preloaded urllib3 response as returned by the ALB."""
+    return HTTPResponse(body=io.BytesIO(body), status=status, preload_content=True)
+
+
 class TestModLambdaError:
     """Test ModLambdaError exception class."""
 
@@ -32,6 +51,14 @@ class TestModLambdaError:
         assert error.message == "test message"
         assert error.status_code == 400
 
+    def test_pickle_round_trip_keeps_status_code(self) -> None:
+        """Test ModLambdaError survives pickling with its slot attributes."""
+        error = pickle.loads(pickle.dumps(ModLambdaError("test message", 404)))
+
+        assert str(error) == "test message"
+        assert error.message == "test message"
+        assert error.status_code == 404
+
 
 class TestValidateEvent:
     """Test validate_event function."""
@@ -171,6 +198,20 @@ class TestValidateEvent:
         assert str(exc_info.value) == "status must be either 'in_progress' or 'done'"
         assert exc_info.value.status_code == 400
 
+    def test_validate_event_unhashable_status(self) -> None:
+        """Test validation fails cleanly when status is not a string."""
+        event = {
+            "widget_id": "test-widget",
+            "status": ["done"],
+            "transitionAt": 1640995200,
+        }
+
+        with pytest.raises(ModLambdaError) as exc_info:
+            validate_event(event)
+
+        assert str(exc_info.value) == "status must be either 'in_progress' or 'done'"
+        assert exc_info.value.status_code == 400
+
     def test_validate_event_negative_transition_at(self) -> None:
         """Test validation fails with negative transitionAt."""
         event = {
@@ -207,166 +248,230 @@ class TestValidateEvent:
 class TestUpdateWidgetViaAlb:
     """Test update_widget_via_alb function."""
 
-    @responses.activate
-    def test_update_widget_success(self) -> None:
-        """Test successful widget update via ALB."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            json={"id": "test-widget", "status": "in_progress"},
-            status=200,
+    def test_init_builds_pool_and_alb_base(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test import-time init creates the pool and normalizes the endpoint."""
+        monkeypatch.setattr("src.lambda_handler._POOL", None)
+
+        with patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com/"}):
+            _init()
+
+        pool = lambda_handler_module._POOL
+        assert lambda_handler_module._ALB_BASE == "https://test-alb.com/widgets/"
+        assert pool.connection_pool_kw["maxsize"] == 8
+        assert Retry.from_int(pool.connection_pool_kw["retries"]).total is False
+        assert pool.headers == {"Content-Type": "application/json"}
+
+    @pytest.mark.parametrize(
+        ("init_type", "expected_calls"),
+        [("provisioned-concurrency", 1), ("on-demand", 0)],
+    )
+    @patch("src.lambda_handler.urllib3.PoolManager")
+    def test_init_warms_connection_for_provisioned_concurrency(
+        self,
+        mock_pool_manager: MagicMock,
+        monkeypatch: pytest.MonkeyPatch,
+        init_type: str,
+        expected_calls: int,
+    ) -> None:
+        """Test init only opens an ALB connection under provisioned concurrency."""
+        monkeypatch.setattr("src.lambda_handler._POOL", None)
+        pool = mock_pool_manager.return_value
+
+        with patch.dict(
+            os.environ,
+            {
+                "ALB_ENDPOINT": "https://test-alb.com/",
+                "AWS_LAMBDA_INITIALIZATION_TYPE": init_type,
+            },
+        ):
+            _init()
+
+        assert pool.request.call_count == expected_calls
+        if expected_calls:
+            pool.request.assert_called_once_with(
+                "HEAD", "https://test-alb.com/", timeout=2.0
+            )
+
+    @patch("src.lambda_handler.urllib3.PoolManager")
+    def test_init_ignores_warm_up_failure(
+        self, mock_pool_manager: MagicMock, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test a failed warm-up request does not break module init."""
+        monkeypatch.setattr("src.lambda_handler._POOL", None)
+        mock_pool_manager.return_value.request.side_effect = NewConnectionError(
+            None, "Connection refused"
         )
 
-        result = update_widget_via_alb(
-            "test-widget", "in_progress", 1640995200, "https://test-alb.com"
+        with patch.dict(
+            os.environ,
+            {
+                "ALB_ENDPOINT": "https://test-alb.com",
+                "AWS_LAMBDA_INITIALIZATION_TYPE": "provisioned-concurrency",
+            },
+        ):
+            _init()
+
+        assert lambda_handler_module._ALB_BASE == "https://test-alb.com/widgets/"
+
+    def test_alb_base_is_resolved_once(self) -> None:
+        """Test the ALB endpoint is normalized once and then reused."""
+        with patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com/"}):
+            assert _get_alb_base() == "https://test-alb.com/widgets/"
+
+        with patch.dict(os.environ, {"ALB_ENDPOINT": "https://other-alb.com"}):
+            assert _get_alb_base() == "https://test-alb.com/widgets/"
+
+    def test_update_widget_success(self, mock_pool: MagicMock) -> None:
+        """Test successful widget update via ALB."""
+        mock_pool.request.return_value = alb_response(
+            b'{"id": "test-widget", "status": "in_progress"}'
         )
 
+        result = update_widget_via_alb("test-widget", "in_progress", 1640995200)
+
         assert result == {"id": "test-widget", "status": "in_progress"}
-        assert len(responses.calls) == 1
+        mock_pool.request.assert_called_once()
 
-        request = responses.calls[0].request
-        assert request.url == "https://test-alb.com/widgets/test-widget"
-        assert json.loads(request.body or "") == {
+        method, url = mock_pool.request.call_args.args
+        assert method == "PUT"
+        assert url == "https://test-alb.com/widgets/test-widget"
+        assert json.loads(mock_pool.request.call_args.kwargs["body"]) == {
             "status": "in_progress",
             "transitionAt": 1640995200,
         }
-        assert request.headers["Content-Type"] == "application/json"
 
-    @responses.activate
-    def test_update_widget_success_with_trailing_slash(self) -> None:
+    def test_update_widget_payload_matches_generic_encoding(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test pre-rendered and fallback payloads match compact JSON output."""
+        mock_pool.request.return_value = alb_response(status=204)
+
+        for status in ("in_progress", "done", "unexpected"):
+            update_widget_via_alb("test-widget", status, 1640995200)
+
+            assert mock_pool.request.call_args.kwargs["body"] == json.dumps(
+                {"status": status, "transitionAt": 1640995200}, separators=(",", ":")
+            ).encode()
+
+    def test_update_widget_success_with_trailing_slash(
+        self, mock_pool: MagicMock
+    ) -> None:
         """Test successful widget update with trailing slash in endpoint."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            json={"success": True},
-            status=200,
-        )
+        mock_pool.request.return_value = alb_response(b'{"success": true}')
 
-        result = update_widget_via_alb(
-            "test-widget", "done", 1640995200, "https://test-alb.com/"
-        )
+        with patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com/"}):
+            result = update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert result == {"success": True}
+        assert mock_pool.request.call_args.args[1] == (
+            "https://test-alb.com/widgets/test-widget"
+        )
 
-    @responses.activate
-    def test_update_widget_empty_response(self) -> None:
+    def test_update_widget_empty_response(self, mock_pool: MagicMock) -> None:
         """Test widget update with empty response body."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body="",
-            status=204,
-        )
+        mock_pool.request.return_value = alb_response(status=204)
 
-        result = update_widget_via_alb(
-            "test-widget", "done", 1640995200, "https://test-alb.com"
-        )
+        result = update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert result == {}
 
-    @responses.activate
-    def test_update_widget_4xx_error(self) -> None:
+    def test_update_widget_4xx_error(self, mock_pool: MagicMock) -> None:
         """Test widget update with 4xx error response."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body="Widget not found",
-            status=404,
-        )
+        mock_pool.request.return_value = alb_response(b"Widget not found", 404)
 
         with pytest.raises(ModLambdaError) as exc_info:
-            update_widget_via_alb(
-                "test-widget", "done", 1640995200, "https://test-alb.com"
-            )
+            update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert "ALB API request failed with status 404" in str(exc_info.value)
         assert exc_info.value.status_code == 404
 
-    @responses.activate
-    def test_update_widget_5xx_error(self) -> None:
+    def test_update_widget_5xx_error(self, mock_pool: MagicMock) -> None:
         """Test widget update with 5xx error response."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body="Internal server error",
-            status=500,
-        )
+        mock_pool.request.return_value = alb_response(b"Internal server error", 500)
 
         with pytest.raises(ModLambdaError) as exc_info:
-            update_widget_via_alb(
-                "test-widget", "done", 1640995200, "https://test-alb.com"
-            )
+            update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert "ALB API request failed with status 500" in str(exc_info.value)
         assert exc_info.value.status_code == 500
 
-    @responses.activate
-    def test_update_widget_timeout(self) -> None:
+    @pytest.mark.parametrize(
+        "error",
+        [
+            ReadTimeoutError(None, "/widgets/test-widget", "Read timed out"),
+            ConnectTimeoutError("Connect timed out"),
+        ],
+    )
+    def test_update_widget_timeout(
+        self, mock_pool: MagicMock, error: Exception
+    ) -> None:
         """Test widget update with timeout."""
-        from requests.exceptions import Timeout
-
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body=Timeout("Request timed out"),
-        )
+        mock_pool.request.side_effect = error
 
         with pytest.raises(ModLambdaError) as exc_info:
-            update_widget_via_alb(
-                "test-widget", "done", 1640995200, "https://test-alb.com"
-            )
+            update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert str(exc_info.value) == "ALB API request timed out"
         assert exc_info.value.status_code == 504
 
-    @responses.activate
-    def test_update_widget_connection_error(self) -> None:
+    @pytest.mark.parametrize(
+        "error",
+        [
+            NewConnectionError(None, "Connection refused"),
+            ProtocolError("Connection aborted"),
+        ],
+    )
+    def test_update_widget_connection_error(
+        self, mock_pool: MagicMock, error: Exception
+    ) -> None:
         """Test widget update with connection error."""
-        from requests.exceptions import ConnectionError
-
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body=ConnectionError("Connection failed"),
-        )
+        mock_pool.request.side_effect = error
 
         with pytest.raises(ModLambdaError) as exc_info:
-            update_widget_via_alb(
-                "test-widget", "done", 1640995200, "https://test-alb.com"
-            )
+            update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert str(exc_info.value) == "Failed to connect to ALB API"
         assert exc_info.value.status_code == 502
 
-    @responses.activate
-    def test_update_widget_invalid_json_response(self) -> None:
+    def test_update_widget_request_exception(self, mock_pool: MagicMock) -> None:
+        """Test widget update with a generic request failure."""
+        mock_pool.request.side_effect = LocationParseError("bad-url")
+
+        with pytest.raises(ModLambdaError) as exc_info:
+            update_widget_via_alb("test-widget", "done", 1640995200)
+
+        assert str(exc_info.value).startswith("ALB API request failed: ")
+        assert exc_info.value.status_code == 500
+
+    def test_update_widget_invalid_json_response(self, mock_pool: MagicMock) -> None:
         """Test widget update with invalid JSON response."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body="invalid json",
-            status=200,
-        )
+        mock_pool.request.return_value = alb_response(b"invalid json")
 
-        result = update_widget_via_alb(
-            "test-widget", "done", 1640995200, "https://test-alb.com"
-        )
+        result = update_widget_via_alb("test-widget", "done", 1640995200)
 
         assert result == {}
 
+    def test_update_widget_non_object_json_response(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test a JSON response that is not an object is rejected."""
+        mock_pool.request.return_value = alb_response(b"[1, 2]")
+
+        with pytest.raises(ModLambdaError) as exc_info:
+            update_widget_via_alb("test-widget", "done", 1640995200)
+
+        assert exc_info.value.status_code == 502
+
 
 class TestLambdaHandler:
     """Test lambda_handler function."""
 
-    @patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com"})
-    @responses.activate
-    def test_lambda_handler_success(self) -> None:
+    def test_lambda_handler_success(self, mock_pool: MagicMock) -> None:
         """Test successful lambda handler execution."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            json={"id": "test-widget", "status": "in_progress"},
-            status=200,
+        mock_pool.request.return_value = alb_response(
+            b'{"id": "test-widget", "status": "in_progress"}'
         )
 
         event = {
@@ -405,7 +510,6 @@ class TestLambdaHandler:
         assert str(exc_info.value) == "ALB_ENDPOINT environment variable not set"
         assert exc_info.value.status_code == 500
 
-    @patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com"})
     def test_lambda_handler_invalid_event(self) -> None:
         """Test lambda handler with invalid event."""
         event = {
@@ -420,16 +524,18 @@ class TestLambdaHandler:
         assert str(exc_info.value) == "widget_id must be a non-empty string"
         assert exc_info.value.status_code == 400
 
-    @patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com"})
-    @responses.activate
-    def test_lambda_handler_alb_api_error(self) -> None:
+    @pytest.mark.parametrize("event", [None, "event", 42])
+    def test_lambda_handler_non_object_event(self, event: Any) -> None:
+        """Test events that are neither objects nor lists are rejected."""
+        with pytest.raises(ModLambdaError) as exc_info:
+            lambda_handler(event, None)
+
+        assert str(exc_info.value) == "Event must be an object"
+        assert exc_info.value.status_code == 400
+
+    def test_lambda_handler_alb_api_error(self, mock_pool: MagicMock) -> None:
         """Test lambda handler with ALB API error."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/test-widget",
-            body="Widget not found",
-            status=404,
-        )
+        mock_pool.request.return_value = alb_response(b"Widget not found", 404)
 
         event = {
             "widget_id": "test-widget",
@@ -443,7 +549,6 @@ class TestLambdaHandler:
         assert "ALB API request failed with status 404" in str(exc_info.value)
         assert exc_info.value.status_code == 404
 
-    @patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com"})
     @patch("src.lambda_handler.validate_event")
     def test_lambda_handler_unexpected_error(self, mock_validate: MagicMock) -> None:
         """Test lambda handler with unexpected error."""
@@ -461,15 +566,10 @@ class TestLambdaHandler:
         assert "Unexpected error: Unexpected error" in str(exc_info.value)
         assert exc_info.value.status_code == 500
 
-    @patch.dict(os.environ, {"ALB_ENDPOINT": "https://test-alb.com"})
-    @responses.activate
-    def test_lambda_handler_done_status(self) -> None:
+    def test_lambda_handler_done_status(self, mock_pool: MagicMock) -> None:
         """Test lambda handler with 'done' status."""
-        responses.add(
-            responses.PUT,
-            "https://test-alb.com/widgets/widget-123",
-            json={"id": "widget-123", "status": "done"},
-            status=200,
+        mock_pool.request.return_value = alb_response(
+            b'{"id": "widget-123", "status": "done"}'
         )
 
         event = {
@@ -485,3 +585,127 @@ class TestLambdaHandler:
         assert result["body"]["widget_id"] == "widget-123"
         assert result["body"]["transitionAt"] == 1703980800
 
+    def test_lambda_handler_repeated_event_skips_alb(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test a retried event is answered from the recent-updates cache."""
+        mock_pool.request.return_value = alb_response(b'{"id": "widget-123"}')
+
+        event = {
+            "widget_id": "widget-123",
+            "status": "done",
+            "transitionAt": 1703980800,
+        }
+
+        first = lambda_handler(event, None)
+        second = lambda_handler(event, None)
+
+        assert second == first
+        assert second is not first
+        mock_pool.request.assert_called_once()
+
+    @patch("src.lambda_handler.time.monotonic")
+    def test_lambda_handler_repeated_event_after_ttl_calls_alb(
+        self, mock_monotonic: MagicMock, mock_pool: MagicMock
+    ) -> None:
+        """Test cached updates expire after the TTL."""
+        mock_pool.request.return_value = alb_response(b'{"id": "widget-123"}')
+        mock_monotonic.side_effect = [1000.0, 1061.0, 1061.0]
+
+        event = {
+            "widget_id": "widget-123",
+            "status": "done",
+            "transitionAt": 1703980800,
+        }
+
+        lambda_handler(event, None)
+        lambda_handler(event, None)
+
+        assert mock_pool.request.call_count == 2
+
+    @patch("src.lambda_handler._RECENT_UPDATES_MAX", 2)
+    def test_lambda_handler_recent_updates_evicts_oldest(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test the recent-updates cache is bounded."""
+        mock_pool.request.return_value = alb_response(status=204)
+
+        for transition_at in (1, 2, 3):
+            lambda_handler(
+                {
+                    "widget_id": "widget-123",
+                    "status": "done",
+                    "transitionAt": transition_at,
+                },
+                None,
+            )
+
+        assert list(lambda_handler_module._RECENT_UPDATES) == [
+            ("widget-123", "done", 2),
+            ("widget-123", "done", 3),
+        ]
+
+    @pytest.mark.parametrize("wrap", [list, lambda items: {"Items": items}])
+    def test_lambda_handler_batch(
+        self, mock_pool: MagicMock, wrap: Callable[[list[dict[str, Any]]], Any]
+    ) -> None:
+        """Test batched events are processed together and keep input order."""
+        mock_pool.request.return_value = alb_response(status=204)
+
+        events = [
+            {"widget_id": f"widget-{i}", "status": "done", "transitionAt": i}
+            for i in range(5)
+        ]
+
+        result = lambda_handler(wrap(events), None)
+
+        assert [r["statusCode"] for r in result] == [200] * 5
+        assert [r["body"]["widget_id"] for r in result] == [
+            f"widget-{i}" for i in range(5)
+        ]
+        assert mock_pool.request.call_count == 5
+
+    def test_lambda_handler_batch_reports_item_errors(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test a failing batch item does not fail the rest of the batch."""
+        mock_pool.request.return_value = alb_response(status=204)
+
+        events = [
+            {"widget_id": "widget-1", "status": "done", "transitionAt": 1},
+            {"widget_id": "widget-2", "status": "invalid", "transitionAt": 2},
+        ]
+
+        result = lambda_handler(events, None)
+
+        assert result[0]["statusCode"] == 200
+        assert result[1] == {
+            "statusCode": 400,
+            "body": {"error": "status must be either 'in_progress' or 'done'"},
+        }
+        mock_pool.request.assert_called_once()
+
+    def test_lambda_handler_batch_applies_duplicates_once(
+        self, mock_pool: MagicMock
+    ) -> None:
+        """Test identical events in one batch make a single ALB call."""
+        mock_pool.request.return_value = alb_response(status=204)
+
+        event = {"widget_id": "widget-1", "status": "done", "transitionAt": 1}
+        other = {"widget_id": "widget-2", "status": "done", "transitionAt": 1}
+
+        result = lambda_handler([event, other, dict(event), event], None)
+
+        assert [r["statusCode"] for r in result] == [200] * 4
+        assert [r["body"]["widget_id"] for r in result] == [
+            "widget-1",
+            "widget-2",
+            "widget-1",
+            "widget-1",
+        ]
+        assert mock_pool.request.call_count == 2
+
+    def test_lambda_handler_empty_batch(self, mock_pool: MagicMock) -> None:
+        """Test an empty batch makes no ALB calls."""
+        assert lambda_handler({"Items": []}, None) == []
+        mock_pool.request.assert_not_called()
@@ -4,20 +4,87 @@ import json
 import logging
 import os
 import time
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List
 
 import boto3
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
-# Configure logging
+# Configure logging; LOG_LEVEL lets deployments drop per-request INFO logs
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource("dynamodb")
+
+def resolve_log_level(name: str) -> int:
+    """Map a LOG_LEVEL value to a logging level, falling back to INFO.
+
+    Args:
+        name: Level name, in any case
+
+    Returns:
+        Matching logging level, or logging.INFO for an unknown name
+    """
+    level = logging.getLevelNamesMapping().get(name.upper())
+    if level is None:
+        logger.warning("Unknown LOG_LEVEL %r, using INFO", name)
+        return logging.INFO
+    return level
+
+
+logger.setLevel(resolve_log_level(os.environ.get("LOG_LEVEL", "INFO")))
+
+# Initialize DynamoDB client. Short timeouts keep a stalled call from using up
+# the ALB request, adaptive retries back off under throttling, and keepalive
+# stops idle connections between invocations from being dropped.
+BOTO_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 3},
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=3
+)
+dynamodb_client = boto3.client("dynamodb", config=BOTO_CONFIG)
 table_name = os.environ.get("DYNAMODB_TABLE_NAME", "step-alb-poc")
-table = dynamodb.Table(table_name)
+
+# BatchWriteItem accepts at most 25 requests per call
+BATCH_WRITE_MAX_ITEMS = 25
+# Calls per batch before unprocessed deletes are given up on, and the delay
+# before the first resend, doubled for each one after it
+BATCH_WRITE_MAX_ATTEMPTS = 5
+BATCH_WRITE_BACKOFF_SECONDS = 0.05
+
+STATUS_DESCRIPTIONS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error"
+}
+RESPONSE_HEADERS = {"Content-Type": "application/json"}
+# Full ALB status lines, so responses do not format them per call
+STATUS_LINES = {
+    code: f"{code} {description}"
+    for code, description in STATUS_DESCRIPTIONS.items()
+}
+
+
+def warm_connection() -> None:
+    """Open the DynamoDB connection during provisioned concurrency init.
+
+    Provisioned concurrency init is not on any request's critical path, so the
+    DNS, TCP and TLS setup is done there for the first request to reuse.
+    On-demand cold starts skip this.
+    """
+    if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") != "provisioned-concurrency":
+        return
+
+    try:
+        dynamodb_client.describe_endpoints()
+    except (BotoCoreError, ClientError) as e:
+        logger.warning("DynamoDB connection warm-up failed: %s", e)
+
+
+warm_connection()
 
 
 class HTTPError(Exception):
@@ -47,11 +114,12 @@ def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
     """
     return {
         "statusCode": status_code,
-        "statusDescription": f"{status_code} {get_status_description(status_code)}",
+        "statusDescription": (
+            STATUS_LINES.get(status_code)
+            or f"{status_code} {get_status_description(status_code)}"
+        ),
         "isBase64Encoded": False,
-        "headers": {
-            "Content-Type": "application/json"
-        },
+        "headers": RESPONSE_HEADERS,
         "body": json.dumps(body)
     }
 
@@ -65,15 +133,7 @@ def get_status_description(status_code: int) -> str:
     Returns:
         Status description string
     """
-    descriptions = {
-        200: "OK",
-        201: "Created",
-        204: "No Content",
-        400: "Bad Request",
-        404: "Not Found",
-        500: "Internal Server Error"
-    }
-    return descriptions.get(status_code, "Unknown")
+    return STATUS_DESCRIPTIONS.get(status_code, "Unknown")
 
 
 def extract_widget_name(path: str) -> str:
@@ -88,16 +148,48 @@ def extract_widget_name(path: str) -> str:
     Raises:
         HTTPError: If widget name cannot be extracted
     """
-    path_parts = [part for part in path.split("/") if part]
-    if not path_parts or len(path_parts) < 2:
-        raise HTTPError(400, "Invalid path format. Expected: /widgets/{widget_name}")
-
-    if path_parts[0] != "widgets":
+    path_parts = path.strip("/").split("/", 2)
+    if len(path_parts) < 2 or path_parts[0] != "widgets" or not path_parts[1]:
         raise HTTPError(400, "Invalid path format. Expected: /widgets/{widget_name}")
 
     return path_parts[1]
 
 
+def delete_items(keys: List[Dict[str, Any]]) -> None:
+    """Delete items with as few BatchWriteItem requests as possible.
+
+    Args:
+        keys: DynamoDB keys of the items to delete
+
+    Raises:
+        ClientError: If a batch write fails
+        HTTPError: If items are still unprocessed after the last attempt
+    """
+    for start in range(0, len(keys), BATCH_WRITE_MAX_ITEMS):
+        request_items: Dict[str, Any] = {
+            table_name: [
+                {"DeleteRequest": {"Key": key}}
+                for key in keys[start:start + BATCH_WRITE_MAX_ITEMS]
+            ]
+        }
+        # Resend anything DynamoDB could not process in this request, backing
+        # off as unprocessed items usually mean the table is throttling
+        for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(BATCH_WRITE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            response = dynamodb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems")
+            if not request_items:
+                break
+        else:
+            logger.error(
+                "Deletes still unprocessed after %d attempts: %s",
+                BATCH_WRITE_MAX_ATTEMPTS,
+                request_items,
+            )
+            raise HTTPError(500, "Failed to delete widget")
+
+
 def handle_post(widget_name: str) -> Dict[str, Any]:
     """Handle POST request to create a widget.
 
@@ -114,25 +206,28 @@ def handle_post(widget_name: str) -> Dict[str, Any]:
         current_time = int(time.time())
         transition_at = current_time + 3600  # +60 minutes
 
-        # Check if widget already exists
-        response = table.get_item(
-            Key={"PK": widget_name, "SK": "new"}
-        )
-
-        if "Item" in response:
-            raise HTTPError(400, f"Widget '{widget_name}' already exists")
-
-        # Create new widget
-        table.put_item(
-            Item={
-                "PK": widget_name,
-                "SK": "new",
-                "transitionAt": transition_at,
-                "createdAt": current_time
-            }
-        )
-
-        logger.info(f"Created widget: {widget_name}")
+        # Create new widget, failing if it already exists
+        try:
+            dynamodb_client.put_item(
+                TableName=table_name,
+                Item={
+                    "PK": {"S": widget_name},
+                    "SK": {"S": "new"},
+                    "transitionAt": {"N": str(transition_at)},
+                    "createdAt": {"N": str(current_time)}
+                },
+                ConditionExpression=(
+                    "attribute_not_exists(PK) AND attribute_not_exists(SK)"
+                )
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise HTTPError(
+                    400, f"Widget '{widget_name}' already exists"
+                ) from None
+            raise
+
+        logger.info("Created widget: %s", widget_name)
         return create_response(201, {
             "message": f"Widget '{widget_name}' created successfully",
             "widget": {
@@ -144,7 +239,7 @@ def handle_post(widget_name: str) -> Dict[str, Any]:
         })
 
     except ClientError as e:
-        logger.error(f"DynamoDB error creating widget {widget_name}: {e}")
+        logger.error("DynamoDB error creating widget %s: %s", widget_name, e)
         raise HTTPError(500, "Failed to create widget") from e
 
 
@@ -165,16 +260,21 @@ def handle_put(widget_name: str, body: str) -> Dict[str, Any]:
         # Parse request body
         try:
             data = json.loads(body)
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, TypeError):
+            # TypeError covers a missing (None) body
             raise HTTPError(400, "Invalid JSON in request body") from None
 
-        if "state" not in data or "transitionAt" not in data:
-            raise HTTPError(400, "Missing required fields: 'state' and 'transitionAt'")
-
-        new_state = data["state"]
-        new_transition_at = data["transitionAt"]
+        try:
+            new_state = data["state"]
+            new_transition_at = data["transitionAt"]
+        except (KeyError, TypeError):
+            # TypeError covers bodies that are valid JSON but not an object
+            raise HTTPError(
+                400, "Missing required fields: 'state' and 'transitionAt'"
+            ) from None
 
-        if not isinstance(new_state, str) or not isinstance(new_transition_at, int):
+        # Exact type checks also reject booleans, which subclass int
+        if type(new_state) is not str or type(new_transition_at) is not int:
             raise HTTPError(
                 400,
                 ("Invalid field types: 'state' must be string, "
@@ -182,8 +282,10 @@ def handle_put(widget_name: str, body: str) -> Dict[str, Any]:
             )
 
         # Check if widget exists (get current state)
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(widget_name)
+        response = dynamodb_client.query(
+            TableName=table_name,
+            KeyConditionExpression="PK = :pk",
+            ExpressionAttributeValues={":pk": {"S": widget_name}}
         )
 
         if not response["Items"]:
@@ -191,26 +293,53 @@ def handle_put(widget_name: str, body: str) -> Dict[str, Any]:
 
         # Get current item to update
         current_item = response["Items"][0]
-        old_state = current_item["SK"]
-
-        # Delete old state record
-        table.delete_item(
-            Key={"PK": widget_name, "SK": old_state}
-        )
+        old_state = current_item["SK"]["S"]
 
-        # Create new state record
         current_time = int(time.time())
-        table.put_item(
-            Item={
-                "PK": widget_name,
-                "SK": new_state,
-                "transitionAt": new_transition_at,
-                "updatedAt": current_time,
-                "createdAt": current_item.get("createdAt", current_time)
-            }
-        )
+        new_item = {
+            "PK": {"S": widget_name},
+            "SK": {"S": new_state},
+            "transitionAt": {"N": str(new_transition_at)},
+            "updatedAt": {"N": str(current_time)},
+            "createdAt": current_item.get("createdAt", {"N": str(current_time)})
+        }
 
-        logger.info(f"Updated widget {widget_name} from {old_state} to {new_state}")
+        if new_state == old_state:
+            # Same key, so it cannot be deleted and put in one transaction.
+            # Delete first anyway: an in-place put would stream as MODIFY,
+            # which the streams lambda ignores, and the rescheduled
+            # transitionAt must start a new execution from its INSERT.
+            dynamodb_client.delete_item(
+                TableName=table_name,
+                Key={"PK": current_item["PK"], "SK": current_item["SK"]}
+            )
+            dynamodb_client.put_item(TableName=table_name, Item=new_item)
+        else:
+            # Swap the old state record for the new one in a single request
+            dynamodb_client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": table_name,
+                            "Key": {
+                                "PK": current_item["PK"],
+                                "SK": current_item["SK"]
+                            }
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": table_name,
+                            "Item": new_item,
+                            "ConditionExpression": "attribute_not_exists(PK)"
+                        }
+                    }
+                ]
+            )
+
+        logger.info(
+            "Updated widget %s from %s to %s", widget_name, old_state, new_state
+        )
         return create_response(200, {
             "message": f"Widget '{widget_name}' updated successfully",
             "widget": {
@@ -222,7 +351,7 @@ def handle_put(widget_name: str, body: str) -> Dict[str, Any]:
         })
 
     except ClientError as e:
-        logger.error(f"DynamoDB error updating widget {widget_name}: {e}")
+        logger.error("DynamoDB error updating widget %s: %s", widget_name, e)
         raise HTTPError(500, "Failed to update widget") from e
 
 
@@ -239,34 +368,36 @@ def handle_get(widget_name: str) -> Dict[str, Any]:
         HTTPError: If retrieval fails
     """
     try:
-        # Get all records for this widget
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(widget_name)
+        # A widget has a single current record, so stop after the first match
+        response = dynamodb_client.query(
+            TableName=table_name,
+            KeyConditionExpression="PK = :pk",
+            ExpressionAttributeValues={":pk": {"S": widget_name}},
+            Limit=1
         )
 
         if not response["Items"]:
             raise HTTPError(404, f"Widget '{widget_name}' not found")
 
-        # Should only be one item, but handle gracefully
         item = response["Items"][0]
 
         widget_data = {
-            "name": item["PK"],
-            "state": item["SK"],
-            "transitionAt": item["transitionAt"]
+            "name": item["PK"]["S"],
+            "state": item["SK"]["S"],
+            "transitionAt": int(item["transitionAt"]["N"])
         }
 
         # Add optional timestamps
         if "createdAt" in item:
-            widget_data["createdAt"] = item["createdAt"]
+            widget_data["createdAt"] = int(item["createdAt"]["N"])
         if "updatedAt" in item:
-            widget_data["updatedAt"] = item["updatedAt"]
+            widget_data["updatedAt"] = int(item["updatedAt"]["N"])
 
-        logger.info(f"Retrieved widget: {widget_name}")
+        logger.info("Retrieved widget: %s", widget_name)
         return create_response(200, {"widget": widget_data})
 
     except ClientError as e:
-        logger.error(f"DynamoDB error retrieving widget {widget_name}: {e}")
+        logger.error("DynamoDB error retrieving widget %s: %s", widget_name, e)
         raise HTTPError(500, "Failed to retrieve widget") from e
 
 
@@ -283,30 +414,39 @@ def handle_delete(widget_name: str) -> Dict[str, Any]:
         HTTPError: If deletion fails
     """
     try:
-        # Get all records for this widget
-        response = table.query(
-            KeyConditionExpression=Key("PK").eq(widget_name)
+        # Get the keys of all records for this widget
+        response = dynamodb_client.query(
+            TableName=table_name,
+            KeyConditionExpression="PK = :pk",
+            ExpressionAttributeValues={":pk": {"S": widget_name}},
+            ProjectionExpression="PK, SK"
         )
 
         if not response["Items"]:
             raise HTTPError(404, f"Widget '{widget_name}' not found")
 
-        # Delete all records for this widget
-        for item in response["Items"]:
-            table.delete_item(
-                Key={"PK": item["PK"], "SK": item["SK"]}
-            )
+        # Delete all records for this widget in batched requests
+        delete_items(response["Items"])
 
-        logger.info(f"Deleted widget: {widget_name}")
+        logger.info("Deleted widget: %s", widget_name)
         return create_response(
             204, {"message": f"Widget '{widget_name}' deleted successfully"}
         )
 
     except ClientError as e:
-        logger.error(f"DynamoDB error deleting widget {widget_name}: {e}")
+        logger.error("DynamoDB error deleting widget %s: %s", widget_name, e)
         raise HTTPError(500, "Failed to delete widget") from e
 
 
+# HTTP method to handler, each called with the widget name and request body
+ROUTES: Dict[str, Callable[[str, str], Dict[str, Any]]] = {
+    "POST": lambda widget_name, body: handle_post(widget_name),
+    "PUT": lambda widget_name, body: handle_put(widget_name, body),
+    "GET": lambda widget_name, body: handle_get(widget_name),
+    "DELETE": lambda widget_name, body: handle_delete(widget_name),
+}
+
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """AWS Lambda handler for ALB requests.
 
@@ -323,27 +463,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         path = event.get("path", "")
         body = event.get("body", "")
 
-        logger.info(f"Processing {http_method} request for path: {path}")
+        logger.info("Processing %s request for path: %s", http_method, path)
 
         # Extract widget name from path
         widget_name = extract_widget_name(path)
 
         # Route to appropriate handler
-        if http_method == "POST":
-            return handle_post(widget_name)
-        elif http_method == "PUT":
-            return handle_put(widget_name, body)
-        elif http_method == "GET":
-            return handle_get(widget_name)
-        elif http_method == "DELETE":
-            return handle_delete(widget_name)
-        else:
+        route = ROUTES.get(http_method)
+        if route is None:
             raise HTTPError(400, f"Unsupported HTTP method: {http_method}")
+        return route(widget_name, body)
 
     except HTTPError as e:
-        logger.warning(f"HTTP error: {e.status_code} - {e.message}")
+        logger.warning("HTTP error: %s - %s", e.status_code, e.message)
         return create_response(e.status_code, {"error": e.message})
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return create_response(500, {"error": "Internal server error"})
 
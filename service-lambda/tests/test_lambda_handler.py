@@ -1,15 +1,23 @@
 """Tests for lambda_handler module."""
 
 import json
+import logging
+import os
 from unittest.mock import Mock, patch
 
 import boto3
 import pytest
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 from moto import mock_aws
 
+import src.lambda_handler as lambda_handler_module
 from src.lambda_handler import (
+    BATCH_WRITE_BACKOFF_SECONDS,
+    BATCH_WRITE_MAX_ATTEMPTS,
     HTTPError,
     create_response,
+    delete_items,
     extract_widget_name,
     get_status_description,
     handle_delete,
@@ -17,9 +25,60 @@ from src.lambda_handler import (
     handle_post,
     handle_put,
     lambda_handler,
+    resolve_log_level,
+    warm_connection,
 )
 
 
+class TestWarmConnection:
+    """Test init-time connection warm-up."""
+
+    @pytest.mark.parametrize(
+        ("init_type", "expected_calls"),
+        [("provisioned-concurrency", 1), ("on-demand", 0)],
+    )
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_warm_connection(
+        self, mock_client: Mock, init_type: str, expected_calls: int
+    ) -> None:
+        """Test only provisioned concurrency init calls DynamoDB."""
+        with patch.dict(
+            os.environ, {"AWS_LAMBDA_INITIALIZATION_TYPE": init_type}
+        ):
+            warm_connection()
+
+        assert mock_client.describe_endpoints.call_count == expected_calls
+
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_warm_connection_ignores_errors(self, mock_client: Mock) -> None:
+        """Test a failed warm-up call does not raise."""
+        mock_client.describe_endpoints.side_effect = ClientError(
+            {"Error": {"Code": "AccessDeniedException"}}, "DescribeEndpoints"
+        )
+
+        with patch.dict(
+            os.environ,
+            {"AWS_LAMBDA_INITIALIZATION_TYPE": "provisioned-concurrency"},
+        ):
+            warm_connection()
+
+        mock_client.describe_endpoints.assert_called_once()
+
+
+class TestClientConfig:
+    """Test DynamoDB client configuration."""
+
+    def test_dynamodb_client_config(self) -> None:
+        """Test the module client uses the tuned botocore config."""
+        config = lambda_handler_module.dynamodb_client.meta.config
+
+        assert config.retries["mode"] == "adaptive"
+        assert config.max_pool_connections == 32
+        assert config.tcp_keepalive is True
+        assert config.connect_timeout == 1
+        assert config.read_timeout == 3
+
+
 class TestHTTPError:
     """Test HTTPError exception class."""
 
@@ -34,6 +93,19 @@ class TestHTTPError:
 class TestUtilityFunctions:
     """Test utility functions."""
 
+    @pytest.mark.parametrize(
+        ("name", "expected"),
+        [
+            ("DEBUG", logging.DEBUG),
+            ("warning", logging.WARNING),
+            ("verbose", logging.INFO),
+            ("", logging.INFO),
+        ],
+    )
+    def test_resolve_log_level(self, name: str, expected: int) -> None:
+        """Test LOG_LEVEL names map to levels and unknown names fall back to INFO."""
+        assert resolve_log_level(name) == expected
+
     def test_create_response(self) -> None:
         """Test create_response function."""
         body = {"message": "success"}
@@ -44,9 +116,16 @@ class TestUtilityFunctions:
             "statusDescription": "200 OK",
             "isBase64Encoded": False,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(body)
+            "body": response["body"]
         }
         assert response == expected
+        assert json.loads(response["body"]) == body
+
+    def test_create_response_unknown_status(self) -> None:
+        """Test create_response with a status code outside the table."""
+        response = create_response(418, {})
+
+        assert response["statusDescription"] == "418 Unknown"
 
     def test_get_status_description(self) -> None:
         """Test get_status_description function."""
@@ -60,6 +139,8 @@ class TestUtilityFunctions:
         assert extract_widget_name("/widgets/test-widget") == "test-widget"
         assert extract_widget_name("/widgets/my_widget") == "my_widget"
         assert extract_widget_name("widgets/widget123") == "widget123"
+        assert extract_widget_name("/widgets/widget123/") == "widget123"
+        assert extract_widget_name("/widgets/widget123/extra") == "widget123"
 
     def test_extract_widget_name_invalid(self) -> None:
         """Test extract_widget_name with invalid paths."""
@@ -75,6 +156,10 @@ class TestUtilityFunctions:
             extract_widget_name("")
         assert exc_info.value.status_code == 400
 
+        with pytest.raises(HTTPError) as exc_info:
+            extract_widget_name("/widgets//widget123")
+        assert exc_info.value.status_code == 400
+
 
 @mock_aws
 class TestCRUDHandlers:
@@ -96,18 +181,14 @@ class TestCRUDHandlers:
             ],
             BillingMode="PAY_PER_REQUEST"
         )
+        self.client = boto3.client("dynamodb", region_name="us-east-1")
 
-        # Patch the table in the module
-        with patch("src.lambda_handler.table", self.table):
-            pass
-
-    @patch("src.lambda_handler.table")
+    @patch("src.lambda_handler.dynamodb_client")
     @patch("src.lambda_handler.time.time")
-    def test_handle_post_success(self, mock_time: Mock, mock_table: Mock) -> None:
+    def test_handle_post_success(self, mock_time: Mock, mock_client: Mock) -> None:
         """Test successful POST request."""
         mock_time.return_value = 1000
-        mock_table.get_item.return_value = {}  # Widget doesn't exist
-        mock_table.put_item.return_value = {}
+        mock_client.put_item.return_value = {}
 
         response = handle_post("test-widget")
 
@@ -117,12 +198,21 @@ class TestCRUDHandlers:
         assert body["widget"]["state"] == "new"
         assert body["widget"]["transitionAt"] == 4600  # 1000 + 3600
 
-        mock_table.put_item.assert_called_once()
+        mock_client.put_item.assert_called_once()
+        assert mock_client.put_item.call_args.kwargs["Item"] == {
+            "PK": {"S": "test-widget"},
+            "SK": {"S": "new"},
+            "transitionAt": {"N": "4600"},
+            "createdAt": {"N": "1000"}
+        }
+        mock_client.get_item.assert_not_called()
 
-    @patch("src.lambda_handler.table")
-    def test_handle_post_widget_exists(self, mock_table: Mock) -> None:
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_post_widget_exists(self, mock_client: Mock) -> None:
         """Test POST request when widget already exists."""
-        mock_table.get_item.return_value = {"Item": {"PK": "test-widget"}}
+        mock_client.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+        )
 
         with pytest.raises(HTTPError) as exc_info:
             handle_post("test-widget")
@@ -130,20 +220,40 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 400
         assert "already exists" in exc_info.value.message
 
-    @patch("src.lambda_handler.table")
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_post_dynamodb_error(self, mock_client: Mock) -> None:
+        """Test POST request when DynamoDB fails."""
+        mock_client.put_item.side_effect = ClientError(
+            {"Error": {"Code": "InternalServerError"}}, "PutItem"
+        )
+
+        with pytest.raises(HTTPError) as exc_info:
+            handle_post("test-widget")
+
+        assert exc_info.value.status_code == 500
+
+    def test_handle_post_twice_conflicts(self) -> None:
+        """Test the conditional put rejects a second create in DynamoDB."""
+        with patch("src.lambda_handler.dynamodb_client", self.client):
+            handle_post("test-widget")
+
+            with pytest.raises(HTTPError) as exc_info:
+                handle_post("test-widget")
+
+        assert exc_info.value.status_code == 400
+
+    @patch("src.lambda_handler.dynamodb_client")
     @patch("src.lambda_handler.time.time")
-    def test_handle_put_success(self, mock_time: Mock, mock_table: Mock) -> None:
+    def test_handle_put_success(self, mock_time: Mock, mock_client: Mock) -> None:
         """Test successful PUT request."""
         mock_time.return_value = 2000
-        mock_table.scan.return_value = {
+        mock_client.query.return_value = {
             "Items": [{
-                "PK": "test-widget",
-                "SK": "old-state",
-                "createdAt": 1000
+                "PK": {"S": "test-widget"},
+                "SK": {"S": "old-state"},
+                "createdAt": {"N": "1000"}
             }]
         }
-        mock_table.delete_item.return_value = {}
-        mock_table.put_item.return_value = {}
 
         body_data = {"state": "new-state", "transitionAt": 5000}
         response = handle_put("test-widget", json.dumps(body_data))
@@ -153,11 +263,81 @@ class TestCRUDHandlers:
         assert body["widget"]["state"] == "new-state"
         assert body["widget"]["transitionAt"] == 5000
 
-        mock_table.delete_item.assert_called_once()
-        mock_table.put_item.assert_called_once()
+        mock_client.transact_write_items.assert_called_once()
+        delete, put = mock_client.transact_write_items.call_args.kwargs[
+            "TransactItems"
+        ]
+        assert delete["Delete"]["Key"] == {
+            "PK": {"S": "test-widget"},
+            "SK": {"S": "old-state"}
+        }
+        assert put["Put"]["Item"] == {
+            "PK": {"S": "test-widget"},
+            "SK": {"S": "new-state"},
+            "transitionAt": {"N": "5000"},
+            "updatedAt": {"N": "2000"},
+            "createdAt": {"N": "1000"}
+        }
+        mock_client.delete_item.assert_not_called()
+        mock_client.put_item.assert_not_called()
+
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_same_state(self, mock_client: Mock) -> None:
+        """Test PUT keeping the current state deletes and re-puts the record."""
+        mock_client.query.return_value = {
+            "Items": [{
+                "PK": {"S": "test-widget"},
+                "SK": {"S": "active"},
+                "createdAt": {"N": "1000"}
+            }]
+        }
+
+        body_data = {"state": "active", "transitionAt": 5000}
+        response = handle_put("test-widget", json.dumps(body_data))
+
+        assert response["statusCode"] == 200
+        # Delete then put, so the stream sees REMOVE + INSERT, not MODIFY
+        assert [name for name, _, _ in mock_client.method_calls] == [
+            "query",
+            "delete_item",
+            "put_item",
+        ]
+        assert mock_client.delete_item.call_args.kwargs["Key"] == {
+            "PK": {"S": "test-widget"},
+            "SK": {"S": "active"},
+        }
+        assert (
+            mock_client.put_item.call_args.kwargs["Item"]["transitionAt"]
+            == {"N": "5000"}
+        )
+
+    def test_handle_put_replaces_record(self) -> None:
+        """Test PUT swaps the state record in DynamoDB."""
+        self.table.put_item(
+            Item={
+                "PK": "test-widget",
+                "SK": "new",
+                "transitionAt": 4600,
+                "createdAt": 1000
+            }
+        )
 
-    @patch("src.lambda_handler.table")
-    def test_handle_put_invalid_json(self, mock_table: Mock) -> None:
+        with patch("src.lambda_handler.dynamodb_client", self.client):
+            handle_put(
+                "test-widget",
+                json.dumps({"state": "in_progress", "transitionAt": 5000})
+            )
+
+        items = self.table.query(
+            KeyConditionExpression=Key("PK").eq("test-widget")
+        )["Items"]
+        assert len(items) == 1
+        assert items[0]["SK"] == "in_progress"
+        assert items[0]["transitionAt"] == 5000
+        assert items[0]["createdAt"] == 1000
+
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_invalid_json(self, mock_client: Mock) -> None:
         """Test PUT request with invalid JSON."""
         with pytest.raises(HTTPError) as exc_info:
             handle_put("test-widget", "invalid json")
@@ -165,8 +345,8 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 400
         assert "Invalid JSON" in exc_info.value.message
 
-    @patch("src.lambda_handler.table")
-    def test_handle_put_missing_fields(self, mock_table: Mock) -> None:
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_missing_fields(self, mock_client: Mock) -> None:
         """Test PUT request with missing fields."""
         body_data = {"state": "new-state"}  # Missing transitionAt
 
@@ -176,10 +356,40 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 400
         assert "Missing required fields" in exc_info.value.message
 
-    @patch("src.lambda_handler.table")
-    def test_handle_put_widget_not_found(self, mock_table: Mock) -> None:
+    @pytest.mark.parametrize("body", ["[]", '"state"', "5"])
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_non_object_body(self, mock_client: Mock, body: str) -> None:
+        """Test PUT request whose JSON body is not an object."""
+        with pytest.raises(HTTPError) as exc_info:
+            handle_put("test-widget", body)
+
+        assert exc_info.value.status_code == 400
+        assert "Missing required fields" in exc_info.value.message
+
+    @pytest.mark.parametrize(
+        "body_data",
+        [
+            {"state": 1, "transitionAt": 5000},
+            {"state": "done", "transitionAt": "5000"},
+            {"state": "done", "transitionAt": True},
+        ],
+    )
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_invalid_field_types(
+        self, mock_client: Mock, body_data: dict
+    ) -> None:
+        """Test PUT request with wrongly typed fields."""
+        with pytest.raises(HTTPError) as exc_info:
+            handle_put("test-widget", json.dumps(body_data))
+
+        assert exc_info.value.status_code == 400
+        assert "Invalid field types" in exc_info.value.message
+        mock_client.query.assert_not_called()
+
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_put_widget_not_found(self, mock_client: Mock) -> None:
         """Test PUT request when widget doesn't exist."""
-        mock_table.scan.return_value = {"Items": []}
+        mock_client.query.return_value = {"Items": []}
 
         body_data = {"state": "new-state", "transitionAt": 5000}
 
@@ -189,16 +399,16 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 404
         assert "not found" in exc_info.value.message
 
-    @patch("src.lambda_handler.table")
-    def test_handle_get_success(self, mock_table: Mock) -> None:
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_get_success(self, mock_client: Mock) -> None:
         """Test successful GET request."""
-        mock_table.scan.return_value = {
+        mock_client.query.return_value = {
             "Items": [{
-                "PK": "test-widget",
-                "SK": "active",
-                "transitionAt": 5000,
-                "createdAt": 1000,
-                "updatedAt": 2000
+                "PK": {"S": "test-widget"},
+                "SK": {"S": "active"},
+                "transitionAt": {"N": "5000"},
+                "createdAt": {"N": "1000"},
+                "updatedAt": {"N": "2000"}
             }]
         }
 
@@ -213,10 +423,40 @@ class TestCRUDHandlers:
         assert widget["createdAt"] == 1000
         assert widget["updatedAt"] == 2000
 
-    @patch("src.lambda_handler.table")
-    def test_handle_get_not_found(self, mock_table: Mock) -> None:
+        mock_client.query.assert_called_once_with(
+            TableName="step-alb-poc",
+            KeyConditionExpression="PK = :pk",
+            ExpressionAttributeValues={":pk": {"S": "test-widget"}},
+            Limit=1
+        )
+
+    def test_handle_get_reads_dynamodb(self) -> None:
+        """Test GET returns the stored record as JSON numbers."""
+        self.table.put_item(
+            Item={
+                "PK": "test-widget",
+                "SK": "new",
+                "transitionAt": 4600,
+                "createdAt": 1000
+            }
+        )
+
+        with patch("src.lambda_handler.dynamodb_client", self.client):
+            response = handle_get("test-widget")
+
+        assert json.loads(response["body"]) == {
+            "widget": {
+                "name": "test-widget",
+                "state": "new",
+                "transitionAt": 4600,
+                "createdAt": 1000
+            }
+        }
+
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_get_not_found(self, mock_client: Mock) -> None:
         """Test GET request when widget doesn't exist."""
-        mock_table.scan.return_value = {"Items": []}
+        mock_client.query.return_value = {"Items": []}
 
         with pytest.raises(HTTPError) as exc_info:
             handle_get("test-widget")
@@ -224,16 +464,12 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 404
         assert "not found" in exc_info.value.message
 
-    @patch("src.lambda_handler.table")
-    def test_handle_delete_success(self, mock_table: Mock) -> None:
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_delete_success(self, mock_client: Mock) -> None:
         """Test successful DELETE request."""
-        mock_table.scan.return_value = {
-            "Items": [{
-                "PK": "test-widget",
-                "SK": "active"
-            }]
-        }
-        mock_table.delete_item.return_value = {}
+        key = {"PK": {"S": "test-widget"}, "SK": {"S": "active"}}
+        mock_client.query.return_value = {"Items": [key]}
+        mock_client.batch_write_item.return_value = {"UnprocessedItems": {}}
 
         response = handle_delete("test-widget")
 
@@ -241,12 +477,32 @@ class TestCRUDHandlers:
         body = json.loads(response["body"])
         assert "deleted successfully" in body["message"]
 
-        mock_table.delete_item.assert_called_once()
+        mock_client.batch_write_item.assert_called_once_with(
+            RequestItems={"step-alb-poc": [{"DeleteRequest": {"Key": key}}]}
+        )
+        mock_client.delete_item.assert_not_called()
+
+    def test_handle_delete_removes_all_records(self) -> None:
+        """Test DELETE removes every record of the widget from DynamoDB."""
+        for state in ("new", "in_progress"):
+            self.table.put_item(
+                Item={"PK": "test-widget", "SK": state, "transitionAt": 4600}
+            )
+        self.table.put_item(
+            Item={"PK": "other-widget", "SK": "new", "transitionAt": 4600}
+        )
+
+        with patch("src.lambda_handler.dynamodb_client", self.client):
+            handle_delete("test-widget")
+
+        assert self.table.scan()["Items"] == [
+            {"PK": "other-widget", "SK": "new", "transitionAt": 4600}
+        ]
 
-    @patch("src.lambda_handler.table")
-    def test_handle_delete_not_found(self, mock_table: Mock) -> None:
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_handle_delete_not_found(self, mock_client: Mock) -> None:
         """Test DELETE request when widget doesn't exist."""
-        mock_table.scan.return_value = {"Items": []}
+        mock_client.query.return_value = {"Items": []}
 
         with pytest.raises(HTTPError) as exc_info:
             handle_delete("test-widget")
@@ -254,6 +510,55 @@ class TestCRUDHandlers:
         assert exc_info.value.status_code == 404
         assert "not found" in exc_info.value.message
 
+    @patch("src.lambda_handler.time.sleep")
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_delete_items_batches_and_retries(
+        self, mock_client: Mock, mock_sleep: Mock
+    ) -> None:
+        """Test deletes are split into 25-item batches and unprocessed resent."""
+        keys = [
+            {"PK": {"S": "test-widget"}, "SK": {"S": f"state-{i}"}}
+            for i in range(30)
+        ]
+        unprocessed = {"step-alb-poc": [{"DeleteRequest": {"Key": keys[0]}}]}
+        mock_client.batch_write_item.side_effect = [
+            {"UnprocessedItems": unprocessed},
+            {"UnprocessedItems": {}},
+            {"UnprocessedItems": {}},
+        ]
+
+        delete_items(keys)
+
+        calls = mock_client.batch_write_item.call_args_list
+        assert [
+            len(call.kwargs["RequestItems"]["step-alb-poc"]) for call in calls
+        ] == [25, 1, 5]
+        assert calls[1].kwargs["RequestItems"] == unprocessed
+        mock_sleep.assert_called_once_with(BATCH_WRITE_BACKOFF_SECONDS)
+
+    @patch("src.lambda_handler.time.sleep")
+    @patch("src.lambda_handler.dynamodb_client")
+    def test_delete_items_gives_up_after_max_attempts(
+        self, mock_client: Mock, mock_sleep: Mock
+    ) -> None:
+        """Test deletes that stay unprocessed back off, then fail the request."""
+        keys = [{"PK": {"S": "test-widget"}, "SK": {"S": "new"}}]
+        mock_client.batch_write_item.return_value = {
+            "UnprocessedItems": {
+                "step-alb-poc": [{"DeleteRequest": {"Key": keys[0]}}]
+            }
+        }
+
+        with pytest.raises(HTTPError) as exc_info:
+            delete_items(keys)
+
+        assert exc_info.value.status_code == 500
+        assert mock_client.batch_write_item.call_count == BATCH_WRITE_MAX_ATTEMPTS
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [
+            BATCH_WRITE_BACKOFF_SECONDS * 2**i
+            for i in range(BATCH_WRITE_MAX_ATTEMPTS - 1)
+        ]
+
 
 class TestLambdaHandler:
     """Test main lambda_handler function."""
@@ -1,15 +1,85 @@
+import hashlib
 import json
 import logging
+import math
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Read once at import so warm invocations skip the environment lookup
+_STEP_FUNCTION_ARN = os.environ.get('STEP_FUNCTION_ARN')
+
+# Step Functions client, created on first use and reused by warm invocations
+_SFN_CLIENT = None
+
+# With SFN_BATCH_MODE=sqs, widgets are sent to SFN_QUEUE_URL in batches and a
+# queue consumer starts the executions, instead of one StartExecution per record
+_SFN_BATCH_MODE = os.environ.get('SFN_BATCH_MODE', '').lower()
+_SFN_QUEUE_URL = os.environ.get('SFN_QUEUE_URL')
+
+# SQS client for the batch mode, created on first use
+_SQS_CLIENT = None
+
+# Entries accepted by a single SendMessageBatch call
+_SQS_BATCH_MAX = 10
+
+# Client config: adaptive retries back off under StartExecution throttling, the
+# pool has room for every worker, and keepalive holds connections across idle
+# periods between invocations
+_BOTO_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=3,
+)
+
+# Shared default for missing record sections and attributes; never mutated
+_EMPTY: Dict[str, Any] = {}
+
+# Epoch seconds of 0001-01-01T00:00:00Z and 9999-12-31T23:59:59Z, the range an
+# ISO-8601 timestamp with a four-digit year can express
+_MIN_EPOCH_SECONDS = -62135596800
+_MAX_EPOCH_SECONDS = 253402300799
+
+# Concurrent start_execution calls per batch, kept within the connection pool
+_MAX_WORKERS = 16
+# Worker threads are started on demand and reused by warm invocations
+_EXECUTOR = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+
+# Executions recently started by this environment, by name. Streams redeliver
+# a whole batch after a failure, so records already started are answered from
+# here instead of calling start_execution again.
+_RECENT_EXECUTIONS: 'OrderedDict[str, str]' = OrderedDict()
+_RECENT_EXECUTIONS_MAX = 10_000
+_RECENT_EXECUTIONS_LOCK = threading.Lock()
+
+
+class _AttributeValue(TypedDict, total=False):
+    """DynamoDB attribute-value envelope of a widget image attribute."""
+
+    S: str
+    N: str
+
+
+class _WidgetImage(TypedDict, total=False):
+    """NewImage of a widget record as delivered by the stream."""
+
+    PK: _AttributeValue
+    SK: _AttributeValue
+    transitionAt: _AttributeValue
+
 
 class StreamProcessorError(Exception):
     """Exception raised for errors in stream processing."""
@@ -23,6 +93,81 @@ class StepFunctionExecutionError(StreamProcessorError):
     pass
 
 
+def _get_sfn_client() -> Any:
+    """Return the shared Step Functions client, creating it on first use.
+
+    Returns:
+        Step Functions boto3 client
+    """
+    global _SFN_CLIENT
+    if _SFN_CLIENT is None:
+        _SFN_CLIENT = boto3.client('stepfunctions', config=_BOTO_CONFIG)
+    return _SFN_CLIENT
+
+
+def _get_sqs_client() -> Any:
+    """Return the shared SQS client, creating it on first use.
+
+    Returns:
+        SQS boto3 client
+    """
+    global _SQS_CLIENT
+    if _SQS_CLIENT is None:
+        _SQS_CLIENT = boto3.client('sqs', config=_BOTO_CONFIG)
+    return _SQS_CLIENT
+
+
+def _warm_clients() -> None:
+    """Build the mode's client at provisioned concurrency init, calling SFN once."""
+    if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') != 'provisioned-concurrency':
+        return
+
+    try:
+        if _SFN_BATCH_MODE == 'sqs':
+            _get_sqs_client()
+        elif _STEP_FUNCTION_ARN:
+            _get_sfn_client().describe_state_machine(
+                stateMachineArn=_STEP_FUNCTION_ARN
+            )
+    except (BotoCoreError, ClientError) as e:
+        logger.warning("Client warm-up failed: %s", e)
+
+
+_warm_clients()
+
+
+def _read_env_arn() -> str:
+    """Read the state machine ARN when it was not set at import.
+
+    Returns:
+        STEP_FUNCTION_ARN environment variable value
+
+    Raises:
+        StreamProcessorError: If STEP_FUNCTION_ARN is not set
+    """
+    step_function_arn = os.environ.get('STEP_FUNCTION_ARN')
+    if not step_function_arn:
+        raise StreamProcessorError("STEP_FUNCTION_ARN environment variable is required")
+    return step_function_arn
+
+
+def _read_env_queue_url() -> str:
+    """Read the widget queue URL when it was not set at import.
+
+    Returns:
+        SFN_QUEUE_URL environment variable value
+
+    Raises:
+        StreamProcessorError: If SFN_QUEUE_URL is not set
+    """
+    queue_url = os.environ.get('SFN_QUEUE_URL')
+    if not queue_url:
+        raise StreamProcessorError(
+            "SFN_QUEUE_URL environment variable is required when SFN_BATCH_MODE=sqs"
+        )
+    return queue_url
+
+
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Process DynamoDB stream records and trigger Step Functions.
 
@@ -35,39 +180,180 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns:
         Dict containing processing results
     """
-    logger.info(f"Processing {len(event.get('Records', []))} stream records")
+    records = event.get('Records') or []
+    logger.info("Processing %d stream records", len(records))
+    # Nothing to start, so skip configuration checks and client construction
+    if not records:
+        return {'processed_count': 0, 'total_records': 0, 'errors': []}
+
+    if _SFN_BATCH_MODE == 'sqs':
+        queue_url = _SFN_QUEUE_URL or _read_env_queue_url()
+        processed_count, errors = _enqueue_records(
+            _get_sqs_client(), queue_url, records
+        )
+    else:
+        step_function_arn = _STEP_FUNCTION_ARN or _read_env_arn()
+
+        sfn_client = _get_sfn_client()
+
+        # start_execution is I/O bound, so records are processed concurrently;
+        # map() keeps the outcomes, and so the error list, in record order
+        outcomes = list(_EXECUTOR.map(
+            lambda record: _process_record(sfn_client, step_function_arn, record),
+            records,
+        ))
+
+        processed_count = 0
+        errors = []
+        for processed, error_msg in outcomes:
+            if processed:
+                processed_count += 1
+            elif error_msg is not None:
+                errors.append(error_msg)
 
-    step_function_arn = os.environ.get('STEP_FUNCTION_ARN')
-    if not step_function_arn:
-        raise StreamProcessorError("STEP_FUNCTION_ARN environment variable is required")
+    result = {
+        'processed_count': processed_count,
+        'total_records': len(records),
+        'errors': errors
+    }
 
-    sfn_client = boto3.client('stepfunctions')
+    logger.info("Processing complete: %s", result)
+    return result
 
-    processed_count = 0
-    errors = []
 
-    for record in event.get('Records', []):
+def _process_record(
+    client: Any,
+    state_machine_arn: str,
+    record: Dict[str, Any],
+) -> Tuple[bool, Optional[str]]:
+    """Trigger a Step Function execution for a single stream record.
+
+    Args:
+        client: Step Functions boto3 client
+        state_machine_arn: ARN of the Step Function state machine
+        record: DynamoDB stream record
+
+    Returns:
+        Tuple of whether an execution was started and the error message, if any
+    """
+    try:
+        # Read the stream data once for both the eligibility check and the
+        # extraction
+        dynamodb_data = record.get('dynamodb', _EMPTY)
+        new_image = _image_to_process(record, dynamodb_data)
+        if new_image is None:
+            logger.debug(
+                "Skipping record with eventName: %s", record.get('eventName')
+            )
+            return False, None
+        widget_data = _extract_image_data(new_image)
+        _trigger_step_function(
+            client,
+            state_machine_arn,
+            widget_data,
+            dynamodb_data.get('SequenceNumber'),
+        )
+        logger.info(
+            "Triggered Step Function for widget: %s", widget_data['widget_id']
+        )
+        return True, None
+    except Exception as e:
+        error_msg = f"Error processing record: {e!s}"
+        logger.error(error_msg)
+        return False, error_msg
+
+
+def _enqueue_records(
+    client: Any,
+    queue_url: str,
+    records: List[Dict[str, Any]],
+) -> Tuple[int, List[str]]:
+    """Send the widgets of a batch of stream records to the widget queue.
+
+    Extraction errors are reported first, in record order, followed by the
+    widgets SQS failed to accept.
+
+    Args:
+        client: SQS boto3 client
+        queue_url: URL of the queue feeding the Step Functions workflow
+        records: DynamoDB stream records
+
+    Returns:
+        Tuple of the number of widgets enqueued and the error messages
+    """
+    widgets = []
+    errors = []
+    for record in records:
         try:
-            if _should_process_record(record):
-                widget_data = _extract_widget_data(record)
-                _trigger_step_function(sfn_client, step_function_arn, widget_data)
-                processed_count += 1
-                logger.info(
-                    f"Triggered Step Function for widget: {widget_data['widget_id']}"
+            new_image = _image_to_process(record, record.get('dynamodb', _EMPTY))
+            if new_image is None:
+                logger.debug(
+                    "Skipping record with eventName: %s", record.get('eventName')
                 )
+                continue
+            widgets.append(_extract_image_data(new_image))
         except Exception as e:
             error_msg = f"Error processing record: {e!s}"
             logger.error(error_msg)
             errors.append(error_msg)
 
-    result = {
-        'processed_count': processed_count,
-        'total_records': len(event.get('Records', [])),
-        'errors': errors
-    }
+    batches = [
+        widgets[i:i + _SQS_BATCH_MAX]
+        for i in range(0, len(widgets), _SQS_BATCH_MAX)
+    ]
+    enqueued_count = 0
+    for enqueued, batch_errors in _EXECUTOR.map(
+        lambda batch: _send_widget_batch(client, queue_url, batch), batches
+    ):
+        enqueued_count += enqueued
+        errors.extend(batch_errors)
+    return enqueued_count, errors
 
-    logger.info(f"Processing complete: {result}")
-    return result
+
+def _send_widget_batch(
+    client: Any,
+    queue_url: str,
+    widgets: List[Dict[str, Any]],
+) -> Tuple[int, List[str]]:
+    """Send up to _SQS_BATCH_MAX widgets in one SendMessageBatch call.
+
+    Args:
+        client: SQS boto3 client
+        queue_url: URL of the queue feeding the Step Functions workflow
+        widgets: Widget data to send, one message each
+
+    Returns:
+        Tuple of the number of widgets accepted and the error messages for
+        those that were not
+    """
+    entries = [
+        {'Id': str(i), 'MessageBody': json.dumps(widget)}
+        for i, widget in enumerate(widgets)
+    ]
+    try:
+        response = client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+    except (BotoCoreError, ClientError) as e:
+        errors = [
+            f"Error processing record: Failed to enqueue widget "
+            f"{widget['widget_id']}: {e}"
+            for widget in widgets
+        ]
+        for error_msg in errors:
+            logger.error(error_msg)
+        return 0, errors
+
+    failed = response.get('Failed') or []
+    errors = []
+    for entry in failed:
+        widget = widgets[int(entry['Id'])]
+        error_msg = (
+            f"Error processing record: Failed to enqueue widget "
+            f"{widget['widget_id']}: {entry.get('Code')} {entry.get('Message', '')}"
+        ).rstrip()
+        logger.error(error_msg)
+        errors.append(error_msg)
+    logger.info("Enqueued %d widgets", len(widgets) - len(failed))
+    return len(widgets) - len(failed), errors
 
 
 def _should_process_record(record: Dict[str, Any]) -> bool:
@@ -81,25 +367,61 @@ def _should_process_record(record: Dict[str, Any]) -> bool:
     Returns:
         True if record should be processed
     """
-    event_name = record.get('eventName')
-    dynamodb_data = record.get('dynamodb', {})
+    return _image_to_process(record, record.get('dynamodb', _EMPTY)) is not None
+
 
-    # Only process INSERT events
-    if event_name != 'INSERT':
-        logger.debug(f"Skipping record with eventName: {event_name}")
-        return False
+def _image_to_process(
+    record: Dict[str, Any], dynamodb_data: Dict[str, Any]
+) -> Optional[_WidgetImage]:
+    """Return the NewImage of a record that should be processed.
 
-    # Verify no OLD image exists (should be None for INSERT)
-    if dynamodb_data.get('OldImage') is not None:
-        logger.debug("Skipping record with OldImage present")
-        return False
+    Only INSERT events (new records with no OLD image) are processed.
+
+    Args:
+        record: DynamoDB stream record
+        dynamodb_data: The record's dynamodb section
+
+    Returns:
+        NewImage of the record, or None if it should be skipped
+    """
+    if record.get('eventName') != 'INSERT' or dynamodb_data.get('OldImage') is not None:
+        return None
+    return dynamodb_data.get('NewImage')
 
-    # Verify NEW image exists
-    if dynamodb_data.get('NewImage') is None:
-        logger.debug("Skipping record without NewImage")
-        return False
 
-    return True
+@lru_cache(maxsize=512)
+def _epoch_to_iso(epoch: float) -> str:
+    """Convert an epoch timestamp to a UTC ISO-8601 string.
+
+    Records in a stream batch often share a transitionAt, so results are cached.
+
+    Args:
+        epoch: Seconds since the Unix epoch
+
+    Returns:
+        ISO-8601 timestamp with a UTC offset, with microseconds only when the
+        epoch has a fractional part (as datetime.isoformat renders it)
+
+    Raises:
+        ValueError: If the epoch is outside the years 1 to 9999
+    """
+    # Split the fraction off first, as datetime does, so large epochs keep
+    # their microseconds
+    fraction, whole = math.modf(epoch)
+    seconds, micros = divmod(round(fraction * 1_000_000), 1_000_000)
+    seconds += int(whole)
+    if not _MIN_EPOCH_SECONDS <= seconds <= _MAX_EPOCH_SECONDS:
+        raise ValueError(f"timestamp out of range: {epoch}")
+
+    # gmtime fills a struct directly, skipping datetime construction
+    t = time.gmtime(seconds)
+    iso = (
+        f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+        f"T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+    )
+    if micros:
+        return f"{iso}.{micros:06d}+00:00"
+    return f"{iso}+00:00"
 
 
 def _extract_widget_data(record: Dict[str, Any]) -> Dict[str, Any]:
@@ -114,23 +436,35 @@ def _extract_widget_data(record: Dict[str, Any]) -> Dict[str, Any]:
     Raises:
         StreamProcessorError: If required data is missing
     """
-    new_image = record.get('dynamodb', {}).get('NewImage', {})
+    return _extract_image_data(
+        record.get('dynamodb', _EMPTY).get('NewImage', _EMPTY)
+    )
+
+
+def _extract_image_data(new_image: _WidgetImage) -> Dict[str, Any]:
+    """Extract widget data from the NewImage of a DynamoDB stream record.
+
+    Args:
+        new_image: NewImage of the stream record
 
+    Returns:
+        Dict containing widget_id, state, and transitionAt (as ISO-8601 string)
+
+    Raises:
+        StreamProcessorError: If required data is missing
+    """
     # Extract PK (widget_id)
-    pk_data = new_image.get('PK', {})
-    widget_id = pk_data.get('S')
+    widget_id = new_image.get('PK', _EMPTY).get('S')
     if not widget_id:
         raise StreamProcessorError("Missing or invalid PK (widget_id) in record")
 
     # Extract SK (state)
-    sk_data = new_image.get('SK', {})
-    state = sk_data.get('S')
+    state = new_image.get('SK', _EMPTY).get('S')
     if not state:
         raise StreamProcessorError("Missing or invalid SK (state) in record")
 
     # Extract transitionAt (number/epoch timestamp)
-    transition_at_data = new_image.get('transitionAt', {})
-    transition_at = transition_at_data.get('N')
+    transition_at = new_image.get('transitionAt', _EMPTY).get('N')
     if not transition_at:
         raise StreamProcessorError("Missing or invalid transitionAt in record")
 
@@ -142,10 +476,8 @@ def _extract_widget_data(record: Dict[str, Any]) -> Dict[str, Any]:
 
     # Convert epoch timestamp to ISO-8601 format for Step Functions
     try:
-        transition_at_iso = datetime.fromtimestamp(
-            transition_at_epoch, tz=timezone.utc
-        ).isoformat()
-    except (ValueError, OSError) as e:
+        transition_at_iso = _epoch_to_iso(transition_at_epoch)
+    except (ValueError, OSError, OverflowError) as e:
         raise StreamProcessorError("transitionAt must be a valid timestamp") from e
 
     return {
@@ -155,10 +487,43 @@ def _extract_widget_data(record: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _execution_name(widget_id: str, sequence_number: str) -> str:
+    """Build a deterministic Step Functions execution name for a stream record.
+
+    A redelivered record maps to the same name, so Step Functions rejects the
+    duplicate instead of starting a second execution.
+
+    Args:
+        widget_id: Widget identifier
+        sequence_number: DynamoDB stream sequence number of the record
+
+    Returns:
+        Execution name within the Step Functions name limits
+    """
+    digest = hashlib.blake2b(
+        f"{widget_id}:{sequence_number}".encode(), digest_size=16
+    ).hexdigest()
+    return f"widget-{digest}"
+
+
+def _remember_execution(execution_name: str, execution_arn: str) -> None:
+    """Record a started execution, evicting the oldest beyond the limit.
+
+    Args:
+        execution_name: Deterministic execution name
+        execution_arn: ARN of the started execution
+    """
+    with _RECENT_EXECUTIONS_LOCK:
+        _RECENT_EXECUTIONS[execution_name] = execution_arn
+        while len(_RECENT_EXECUTIONS) > _RECENT_EXECUTIONS_MAX:
+            _RECENT_EXECUTIONS.popitem(last=False)
+
+
 def _trigger_step_function(
     client: Any,
     state_machine_arn: str,
     widget_data: Dict[str, Any],
+    sequence_number: Optional[str] = None,
 ) -> str:
     """Trigger Step Function execution with widget data.
 
@@ -166,6 +531,9 @@ def _trigger_step_function(
         client: Step Functions boto3 client
         state_machine_arn: ARN of the Step Function state machine
         widget_data: Widget data to pass as input
+        sequence_number: Stream sequence number of the record, used to give
+            the execution a deterministic name; without it Step Functions
+            generates one
 
     Returns:
         Execution ARN
@@ -173,19 +541,27 @@ def _trigger_step_function(
     Raises:
         StepFunctionExecutionError: If execution fails
     """
-    execution_name = (
-        f"widget-{widget_data['widget_id']}-{int(datetime.now().timestamp())}"
-    )
+    kwargs = {
+        'stateMachineArn': state_machine_arn,
+        'input': json.dumps(widget_data),
+    }
+    execution_name = None
+    if sequence_number:
+        execution_name = _execution_name(widget_data['widget_id'], sequence_number)
+        with _RECENT_EXECUTIONS_LOCK:
+            recent_arn = _RECENT_EXECUTIONS.get(execution_name)
+        if recent_arn is not None:
+            logger.info("Skipping redelivered record, execution: %s", recent_arn)
+            return recent_arn
+        kwargs['name'] = execution_name
 
     try:
-        response = client.start_execution(
-            stateMachineArn=state_machine_arn,
-            name=execution_name,
-            input=json.dumps(widget_data),
-        )
+        response = client.start_execution(**kwargs)
 
         execution_arn: str = response["executionArn"]
-        logger.info(f"Started Step Function execution: {execution_arn}")
+        logger.info("Started Step Function execution: %s", execution_arn)
+        if execution_name is not None:
+            _remember_execution(execution_name, execution_arn)
         return execution_arn
 
     except ClientError as e:
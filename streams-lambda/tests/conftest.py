@@ -0,0 +1,107 @@
+"""Shared fixtures for streams lambda tests."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+from unittest.mock import Mock
+
+import pytest
+
+
+class FakeSFN:
+    """In-process Step Functions client that records the calls made to it."""
+
+    def __init__(self) -> None:
+        """Start with no calls, no queued responses and no warm-up error."""
+        self.calls: List[Dict[str, Any]] = []
+        self.responses: List[Any] = []
+        self.caller_threads: Set[int] = set()
+        self.describe_calls: List[Dict[str, Any]] = []
+        self.describe_error: Optional[Exception] = None
+
+    def start_execution(self, **kwargs: Any) -> Dict[str, Any]:
+        """Record the call and return the next queued or the default response.
+
+        A queued exception is raised instead of returned.
+        """
+        self.calls.append(kwargs)
+        self.caller_threads.add(threading.get_ident())
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return {
+            'executionArn': (
+                'arn:aws:states:us-east-1:123456789012:execution:test:test-exec'
+            )
+        }
+
+    def describe_state_machine(self, **kwargs: Any) -> Dict[str, Any]:
+        """Record the call and raise describe_error if one is set."""
+        self.describe_calls.append(kwargs)
+        if self.describe_error is not None:
+            raise self.describe_error
+        return {'stateMachineArn': kwargs['stateMachineArn']}
+
+
+@pytest.fixture(scope='session')
+def step_function_arn() -> str:
+    """State machine ARN used across the suite."""
+    return 'arn:aws:states:us-east-1:123456789012:stateMachine:sm'
+
+
+@pytest.fixture
+def sfn_env(monkeypatch: pytest.MonkeyPatch, step_function_arn: str) -> str:
+    """Expose the state machine ARN through STEP_FUNCTION_ARN."""
+    monkeypatch.setenv('STEP_FUNCTION_ARN', step_function_arn)
+    return step_function_arn
+
+
+@pytest.fixture(autouse=True)
+def reset_module_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Drop the cached clients and remembered executions so each test starts cold."""
+    monkeypatch.setattr('src.lambda_handler._SFN_CLIENT', None)
+    monkeypatch.setattr('src.lambda_handler._SQS_CLIENT', None)
+    monkeypatch.setattr('src.lambda_handler._RECENT_EXECUTIONS', OrderedDict())
+
+
+@pytest.fixture
+def fake_sfn(monkeypatch: pytest.MonkeyPatch) -> FakeSFN:
+    """Install a FakeSFN as the shared Step Functions client."""
+    client = FakeSFN()
+    monkeypatch.setattr('src.lambda_handler._SFN_CLIENT', client)
+    return client
+
+
+@pytest.fixture
+def sqs_batch_mode(monkeypatch: pytest.MonkeyPatch) -> str:
+    """Send widgets to a queue instead of starting executions directly."""
+    queue_url = 'https://sqs.us-east-1.amazonaws.com/123456789012/widgets'
+    monkeypatch.setattr('src.lambda_handler._SFN_BATCH_MODE', 'sqs')
+    monkeypatch.setattr('src.lambda_handler._SFN_QUEUE_URL', queue_url)
+    return queue_url
+
+
+@pytest.fixture
+def mock_sqs_client(monkeypatch: pytest.MonkeyPatch) -> Mock:
+    """Install a mock SQS client that accepts every message."""
+    client = Mock()
+    client.send_message_batch.return_value = {'Successful': [], 'Failed': []}
+    monkeypatch.setattr('src.lambda_handler._SQS_CLIENT', client)
+    return client
+
+
+@pytest.fixture
+def insert_record() -> Callable[..., Dict[str, Any]]:
+    """Build INSERT stream records for a widget in the 'new' state."""
+
+    def factory(
+        widget_id: str, transition_at: Optional[str] = '1704110400'
+    ) -> Dict[str, Any]:
+        image: Dict[str, Any] = {'PK': {'S': widget_id}, 'SK': {'S': 'new'}}
+        if transition_at is not None:
+            image['transitionAt'] = {'N': transition_at}
+        return {'eventName': 'INSERT', 'dynamodb': {'NewImage': image}}
+
+    return factory
@@ -1,16 +1,24 @@
 import json
 import os
-from unittest.mock import Mock, patch
+import re
+import threading
+from datetime import datetime, timezone
+from unittest.mock import patch
 
+import boto3
 import pytest
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, EndpointConnectionError
 
 from src.lambda_handler import (
+    _BOTO_CONFIG,
     StepFunctionExecutionError,
     StreamProcessorError,
+    _epoch_to_iso,
+    _execution_name,
     _extract_widget_data,
     _should_process_record,
     _trigger_step_function,
+    _warm_clients,
     lambda_handler,
 )
 
@@ -18,45 +26,68 @@ from src.lambda_handler import (
 class TestLambdaHandler:
     """Test cases for the main lambda_handler function."""
 
-    @patch.dict(
-        os.environ,
-        {
-            "STEP_FUNCTION_ARN": "arn:aws:states:us-east-1:123456789012:stateMachine:sm"
-        },
-    )
-    @patch('src.lambda_handler.boto3.client')
-    def test_lambda_handler_success(self, mock_boto_client):
+    @pytest.mark.usefixtures('sfn_env')
+    def test_lambda_handler_success(
+        self, fake_sfn, step_function_arn, insert_record
+    ):
         """Test successful processing of stream records."""
-        mock_sfn_client = Mock()
-        mock_boto_client.return_value = mock_sfn_client
-        mock_sfn_client.start_execution.return_value = {
-            "executionArn": (
-                "arn:aws:states:us-east-1:123456789012:execution:test:test-exec"
-            )
-        }
-
-        event = {
-            'Records': [
-                {
-                    'eventName': 'INSERT',
-                    'dynamodb': {
-                        'NewImage': {
-                            'PK': {'S': 'widget-123'},
-                            'SK': {'S': 'new'},
-                            'transitionAt': {'N': '1704110400'}
-                        }
-                    }
-                }
-            ]
-        }
+        event = {'Records': [insert_record('widget-123')]}
 
         result = lambda_handler(event, {})
 
         assert result['processed_count'] == 1
         assert result['total_records'] == 1
         assert result['errors'] == []
-        mock_sfn_client.start_execution.assert_called_once()
+        assert len(fake_sfn.calls) == 1
+        assert fake_sfn.calls[0]['stateMachineArn'] == step_function_arn
+        assert json.loads(fake_sfn.calls[0]['input'])['widget_id'] == 'widget-123'
+
+    @pytest.mark.usefixtures('sfn_env')
+    @patch('src.lambda_handler.boto3.client')
+    def test_lambda_handler_reuses_sfn_client(self, mock_boto_client):
+        """Test warm invocations reuse one Step Functions client."""
+        event = {'Records': [{'eventName': 'REMOVE', 'dynamodb': {}}]}
+
+        for _ in range(3):
+            lambda_handler(event, {})
+
+        mock_boto_client.assert_called_once_with(
+            'stepfunctions', config=_BOTO_CONFIG
+        )
+
+    @pytest.mark.usefixtures('sfn_env')
+    def test_lambda_handler_starts_executions_concurrently(
+        self, fake_sfn, insert_record
+    ):
+        """Test a batch has several executions in flight at once."""
+        # Every call waits for the others, so a serial loop breaks the barrier
+        barrier = threading.Barrier(8, timeout=5)
+        start_execution = fake_sfn.start_execution
+
+        def start_execution_together(**kwargs):
+            barrier.wait()
+            return start_execution(**kwargs)
+
+        fake_sfn.start_execution = start_execution_together
+        event = {'Records': [insert_record(f'widget-{i}') for i in range(8)]}
+
+        result = lambda_handler(event, {})
 
+        assert result == {'processed_count': 8, 'total_records': 8, 'errors': []}
+        assert len(fake_sfn.caller_threads) == 8
+
+    def test_lambda_handler_uses_arn_read_at_import(self, fake_sfn, insert_record):
+        """Test the ARN captured at import is used without the environment."""
+        event = {'Records': [insert_record('widget-123')]}
+
+        with patch.dict(os.environ, {}, clear=True), patch(
+            'src.lambda_handler._STEP_FUNCTION_ARN', 'arn:import'
+        ):
+            lambda_handler(event, {})
+
+        assert fake_sfn.calls[0]['stateMachineArn'] == 'arn:import'
+
+    @patch('src.lambda_handler._STEP_FUNCTION_ARN', None)
     def test_lambda_handler_missing_env_var(self):
         """Test lambda_handler raises error when STEP_FUNCTION_ARN is missing."""
         with patch.dict(os.environ, {}, clear=True):
@@ -64,56 +95,201 @@ class TestLambdaHandler:
                 StreamProcessorError,
                 match="STEP_FUNCTION_ARN environment variable is required",
             ):
-                lambda_handler({'Records': []}, {})
+                lambda_handler({'Records': [{'eventName': 'INSERT'}]}, {})
 
-    @patch.dict(
-        os.environ,
-        {
-            "STEP_FUNCTION_ARN": "arn:aws:states:us-east-1:123456789012:stateMachine:sm"
-        },
-    )
-    @patch('src.lambda_handler.boto3.client')
-    def test_lambda_handler_with_errors(self, mock_boto_client):
+    @pytest.mark.usefixtures('sfn_env')
+    def test_lambda_handler_with_errors(self, fake_sfn, insert_record):
         """Test lambda_handler handles processing errors gracefully."""
-        mock_sfn_client = Mock()
-        mock_boto_client.return_value = mock_sfn_client
+        # Missing transitionAt to trigger error
+        event = {'Records': [insert_record('widget-123', None)]}
 
+        result = lambda_handler(event, {})
+
+        assert result['processed_count'] == 0
+        assert result['total_records'] == 1
+        assert len(result['errors']) == 1
+        assert 'Missing or invalid transitionAt' in result['errors'][0]
+        assert fake_sfn.calls == []
+
+    @pytest.mark.usefixtures('sfn_env')
+    def test_lambda_handler_batch_keeps_error_order(self, fake_sfn, insert_record):
+        """Test a batch processed concurrently reports errors in record order."""
         event = {
             'Records': [
+                insert_record('widget-0', '1704110400'),
+                insert_record('widget-1', None),
+                {'eventName': 'REMOVE', 'dynamodb': {}},
+                insert_record('widget-3', 'invalid-number'),
+                *[insert_record(f'widget-{i}', '1704110400') for i in range(4, 20)],
+            ]
+        }
+
+        result = lambda_handler(event, {})
+
+        assert result['processed_count'] == 17
+        assert result['total_records'] == 20
+        assert result['errors'] == [
+            'Error processing record: Missing or invalid transitionAt in record',
+            'Error processing record: transitionAt must be a valid number',
+        ]
+        assert len(fake_sfn.calls) == 17
+
+    @patch('src.lambda_handler._STEP_FUNCTION_ARN', None)
+    @patch('src.lambda_handler.boto3.client')
+    @pytest.mark.parametrize('event', [{'Records': []}, {'Records': None}, {}])
+    def test_lambda_handler_empty_records(self, mock_boto_client, event):
+        """Test no records skip the configuration check and client construction."""
+        with patch.dict(os.environ, {}, clear=True):
+            result = lambda_handler(event, {})
+
+        assert result == {'processed_count': 0, 'total_records': 0, 'errors': []}
+        mock_boto_client.assert_not_called()
+
+
+@pytest.mark.usefixtures('sqs_batch_mode')
+class TestSqsBatchMode:
+    """Test cases for sending widgets to SQS with SFN_BATCH_MODE=sqs."""
+
+    def test_records_sent_in_batches_of_ten(
+        self, sqs_batch_mode, mock_sqs_client, fake_sfn, insert_record
+    ):
+        """Test 25 records take three SendMessageBatch calls and no executions."""
+        event = {'Records': [insert_record(f'widget-{i}') for i in range(25)]}
+
+        result = lambda_handler(event, {})
+
+        assert result == {'processed_count': 25, 'total_records': 25, 'errors': []}
+        calls = mock_sqs_client.send_message_batch.call_args_list
+        assert sorted(len(c.kwargs['Entries']) for c in calls) == [5, 10, 10]
+        assert all(c.kwargs['QueueUrl'] == sqs_batch_mode for c in calls)
+        bodies = [
+            json.loads(entry['MessageBody'])
+            for c in calls
+            for entry in c.kwargs['Entries']
+        ]
+        assert sorted(body['widget_id'] for body in bodies) == sorted(
+            f'widget-{i}' for i in range(25)
+        )
+        assert bodies[0]['transitionAt'] == '2024-01-01T12:00:00+00:00'
+        assert fake_sfn.calls == []
+
+    def test_failed_entries_reported(self, mock_sqs_client, insert_record):
+        """Test entries SQS rejects are reported alongside extraction errors."""
+        mock_sqs_client.send_message_batch.return_value = {
+            'Successful': [{'Id': '0'}],
+            'Failed': [
                 {
-                    'eventName': 'INSERT',
-                    'dynamodb': {
-                        'NewImage': {
-                            'PK': {'S': 'widget-123'},
-                            'SK': {'S': 'new'}
-                            # Missing transitionAt to trigger error
-                        }
-                    }
+                    'Id': '1',
+                    'SenderFault': False,
+                    'Code': 'InternalError',
+                    'Message': 'try again',
                 }
+            ],
+        }
+        event = {
+            'Records': [
+                insert_record('widget-0'),
+                insert_record('widget-1', None),
+                insert_record('widget-2'),
             ]
         }
 
         result = lambda_handler(event, {})
 
+        assert result['processed_count'] == 1
+        assert result['total_records'] == 3
+        assert result['errors'] == [
+            'Error processing record: Missing or invalid transitionAt in record',
+            'Error processing record: Failed to enqueue widget widget-2: '
+            'InternalError try again',
+        ]
+
+    def test_batch_client_error_reports_each_widget(
+        self, mock_sqs_client, insert_record
+    ):
+        """Test a rejected SendMessageBatch call reports every widget in it."""
+        mock_sqs_client.send_message_batch.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied', 'Message': 'denied'}},
+            'SendMessageBatch',
+        )
+        event = {'Records': [insert_record('widget-0'), insert_record('widget-1')]}
+
+        result = lambda_handler(event, {})
+
         assert result['processed_count'] == 0
-        assert result['total_records'] == 1
-        assert len(result['errors']) == 1
-        assert 'Missing or invalid transitionAt' in result['errors'][0]
+        assert len(result['errors']) == 2
+        assert 'Failed to enqueue widget widget-1' in result['errors'][1]
+
+    def test_batch_connection_error_reports_each_widget(
+        self, mock_sqs_client, insert_record
+    ):
+        """Test a timed-out SendMessageBatch call is reported, not raised."""
+        mock_sqs_client.send_message_batch.side_effect = EndpointConnectionError(
+            endpoint_url='https://sqs.us-east-1.amazonaws.com'
+        )
+        event = {'Records': [insert_record(f'widget-{i}') for i in range(12)]}
 
-    @patch.dict(
-        os.environ,
-        {
-            "STEP_FUNCTION_ARN": "arn:aws:states:us-east-1:123456789012:stateMachine:sm"
-        },
-    )
-    @patch('src.lambda_handler.boto3.client')
-    def test_lambda_handler_empty_records(self, mock_boto_client):
-        """Test lambda_handler with no records."""
-        result = lambda_handler({'Records': []}, {})
+        result = lambda_handler(event, {})
 
         assert result['processed_count'] == 0
-        assert result['total_records'] == 0
-        assert result['errors'] == []
+        assert result['total_records'] == 12
+        assert len(result['errors']) == 12
+        assert 'Failed to enqueue widget widget-11' in result['errors'][11]
+
+    @patch('src.lambda_handler._SFN_QUEUE_URL', None)
+    def test_missing_queue_url(self):
+        """Test the batch mode requires SFN_QUEUE_URL."""
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(
+                StreamProcessorError,
+                match="SFN_QUEUE_URL environment variable is required",
+            ):
+                lambda_handler({'Records': [{'eventName': 'INSERT'}]}, {})
+
+
+class TestWarmClients:
+    """Test cases for init-time client warm-up."""
+
+    @pytest.mark.parametrize(
+        ('init_type', 'expected_calls'),
+        [('provisioned-concurrency', 1), ('on-demand', 0)],
+    )
+    @patch('src.lambda_handler._STEP_FUNCTION_ARN', 'arn:sm')
+    def test_warm_clients(self, fake_sfn, monkeypatch, init_type, expected_calls):
+        """Test only provisioned concurrency init calls Step Functions."""
+        monkeypatch.setenv('AWS_LAMBDA_INITIALIZATION_TYPE', init_type)
+
+        _warm_clients()
+
+        assert len(fake_sfn.describe_calls) == expected_calls
+
+    @patch('src.lambda_handler._STEP_FUNCTION_ARN', 'arn:sm')
+    def test_warm_clients_ignores_errors(self, fake_sfn, monkeypatch):
+        """Test a failed warm-up call does not raise."""
+        fake_sfn.describe_error = ClientError(
+            {'Error': {'Code': 'AccessDeniedException'}}, 'DescribeStateMachine'
+        )
+        monkeypatch.setenv('AWS_LAMBDA_INITIALIZATION_TYPE', 'provisioned-concurrency')
+
+        _warm_clients()
+
+        assert fake_sfn.describe_calls == [{'stateMachineArn': 'arn:sm'}]
+
+
+class TestSfnClientConfig:
+    """Test cases for the Step Functions client configuration."""
+
+    def test_sfn_client_connection_config(self):
+        """Test the client keeps idle connections alive and fails fast."""
+        client = boto3.client(
+            'stepfunctions', region_name='us-east-1', config=_BOTO_CONFIG
+        )
+
+        config = client.meta.config
+        assert config.tcp_keepalive is True
+        assert config.max_pool_connections == 32
+        assert config.connect_timeout == 1
+        assert config.read_timeout == 3
 
 
 class TestShouldProcessRecord:
@@ -181,17 +357,9 @@ class TestShouldProcessRecord:
 class TestExtractWidgetData:
     """Test cases for _extract_widget_data function."""
 
-    def test_extract_widget_data_success(self):
+    def test_extract_widget_data_success(self, insert_record):
         """Test successful extraction of widget data."""
-        record = {
-            'dynamodb': {
-                'NewImage': {
-                    'PK': {'S': 'widget-123'},
-                    'SK': {'S': 'new'},
-                    'transitionAt': {'N': '1704110400'}
-                }
-            }
-        }
+        record = insert_record('widget-123')
 
         result = _extract_widget_data(record)
 
@@ -229,16 +397,9 @@ class TestExtractWidgetData:
         with pytest.raises(StreamProcessorError, match="Missing or invalid SK"):
             _extract_widget_data(record)
 
-    def test_extract_widget_data_missing_transition_at(self):
+    def test_extract_widget_data_missing_transition_at(self, insert_record):
         """Test error when transitionAt is missing."""
-        record = {
-            'dynamodb': {
-                'NewImage': {
-                    'PK': {'S': 'widget-123'},
-                    'SK': {'S': 'new'}
-                }
-            }
-        }
+        record = insert_record('widget-123', None)
 
         with pytest.raises(
             StreamProcessorError, match="Missing or invalid transitionAt"
@@ -260,34 +421,58 @@ class TestExtractWidgetData:
         with pytest.raises(StreamProcessorError, match="Missing or invalid PK"):
             _extract_widget_data(record)
 
-    def test_extract_widget_data_invalid_transition_at_number(self):
+    def test_extract_widget_data_invalid_transition_at_number(self, insert_record):
         """Test error when transitionAt is not a valid number."""
-        record = {
-            'dynamodb': {
-                'NewImage': {
-                    'PK': {'S': 'widget-123'},
-                    'SK': {'S': 'new'},
-                    'transitionAt': {'N': 'invalid-number'}
-                }
-            }
-        }
+        record = insert_record('widget-123', 'invalid-number')
 
         with pytest.raises(
             StreamProcessorError, match="transitionAt must be a valid number"
         ):
             _extract_widget_data(record)
 
-    def test_extract_widget_data_invalid_timestamp_range(self):
+    def test_extract_widget_data_reuses_iso_conversion(self, insert_record):
+        """Test records sharing a transitionAt reuse the cached ISO string."""
+        record = insert_record('widget-123')
+        _epoch_to_iso.cache_clear()
+
+        first = _extract_widget_data(record)
+        second = _extract_widget_data(record)
+
+        assert first == second
+        assert _epoch_to_iso.cache_info().hits == 1
+
+    @pytest.mark.parametrize(
+        'epoch', [0, 1704110400, 1704110400.5, 1704110400.1234567, -1.5]
+    )
+    def test_epoch_to_iso_matches_datetime(self, epoch):
+        """Test the ISO conversion renders timestamps as datetime does."""
+        expected = datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+        assert _epoch_to_iso(epoch) == expected
+
+    @pytest.mark.parametrize(
+        ('epoch', 'expected'),
+        [
+            (253402300799, '9999-12-31T23:59:59+00:00'),
+            (-62135596800, '0001-01-01T00:00:00+00:00'),
+        ],
+    )
+    def test_epoch_to_iso_range_limits(self, epoch, expected):
+        """Test the first and last representable seconds are accepted."""
+        assert _epoch_to_iso(epoch) == expected
+
+    @pytest.mark.parametrize(
+        'epoch', [253402300800, -62135596801, float('inf'), float('nan')]
+    )
+    def test_epoch_to_iso_out_of_range(self, epoch):
+        """Test epochs past the four-digit-year range are rejected."""
+        with pytest.raises((ValueError, OverflowError)):
+            _epoch_to_iso(epoch)
+
+    def test_extract_widget_data_invalid_timestamp_range(self, insert_record):
         """Test error when transitionAt is out of valid timestamp range."""
-        record = {
-            'dynamodb': {
-                'NewImage': {
-                    'PK': {'S': 'widget-123'},
-                    'SK': {'S': 'new'},
-                    'transitionAt': {'N': '9999999999999'}  # Far future timestamp
-                }
-            }
-        }
+        # Far future timestamp
+        record = insert_record('widget-123', '9999999999999')
 
         with pytest.raises(
             StreamProcessorError, match="transitionAt must be a valid timestamp"
@@ -298,17 +483,8 @@ class TestExtractWidgetData:
 class TestTriggerStepFunction:
     """Test cases for _trigger_step_function function."""
 
-    @patch('src.lambda_handler.datetime')
-    def test_trigger_step_function_success(self, mock_datetime):
+    def test_trigger_step_function_success(self, fake_sfn):
         """Test successful Step Function trigger."""
-        mock_datetime.now.return_value.timestamp.return_value = 1704110400
-        mock_client = Mock()
-        mock_client.start_execution.return_value = {
-            "executionArn": (
-                "arn:aws:states:us-east-1:123456789012:execution:test:test-exec"
-            )
-        }
-
         widget_data = {
             'widget_id': 'widget-123',
             'state': 'new',
@@ -316,27 +492,106 @@ class TestTriggerStepFunction:
         }
 
         result = _trigger_step_function(
-            mock_client,
+            fake_sfn,
             'arn:aws:states:us-east-1:123456789012:stateMachine:test',
             widget_data
         )
 
         expected_arn = "arn:aws:states:us-east-1:123456789012:execution:test:test-exec"
         assert result == expected_arn
-        mock_client.start_execution.assert_called_once_with(
-            stateMachineArn='arn:aws:states:us-east-1:123456789012:stateMachine:test',
-            name='widget-widget-123-1704110400',
-            input=json.dumps(widget_data)
+        assert len(fake_sfn.calls) == 1
+        kwargs = fake_sfn.calls[0]
+        assert kwargs.keys() == {'stateMachineArn', 'input'}
+        assert (
+            kwargs['stateMachineArn']
+            == 'arn:aws:states:us-east-1:123456789012:stateMachine:test'
         )
+        # Compare the decoded input so the test does not depend on the serializer
+        assert isinstance(kwargs['input'], str)
+        assert json.loads(kwargs['input']) == widget_data
 
-    def test_trigger_step_function_client_error(self):
-        """Test Step Function trigger with ClientError."""
-        mock_client = Mock()
-        mock_client.start_execution.side_effect = ClientError(
-            {'Error': {'Code': 'InvalidParameterValue', 'Message': 'Invalid input'}},
-            'StartExecution'
+    def test_trigger_step_function_escapes_input(self, fake_sfn):
+        """Test quotes, backslashes and control characters survive as JSON."""
+        widget_data = {
+            'widget_id': 'widget-"quoted"\\path\nline\ttab\u2028',
+            'state': 'new\x00',
+            'transitionAt': '2024-01-01T12:00:00+00:00'
+        }
+
+        _trigger_step_function(
+            fake_sfn,
+            'arn:aws:states:us-east-1:123456789012:stateMachine:test',
+            widget_data
         )
 
+        assert json.loads(fake_sfn.calls[0]['input']) == widget_data
+
+    def test_trigger_step_function_skips_redelivered_record(self, fake_sfn):
+        """Test a record seen again is not started a second time."""
+        fake_sfn.responses.append({'executionArn': 'arn:exec'})
+        widget_data = {
+            'widget_id': 'widget-123',
+            'state': 'new',
+            'transitionAt': '2024-01-01T12:00:00+00:00'
+        }
+
+        first = _trigger_step_function(fake_sfn, 'arn:sm', widget_data, '111')
+        second = _trigger_step_function(fake_sfn, 'arn:sm', widget_data, '111')
+
+        assert first == second == 'arn:exec'
+        assert len(fake_sfn.calls) == 1
+
+    @patch('src.lambda_handler._RECENT_EXECUTIONS_MAX', 2)
+    def test_trigger_step_function_recent_executions_bounded(self, fake_sfn):
+        """Test the remembered executions drop the oldest beyond the limit."""
+        widget_data = {
+            'widget_id': 'widget-123',
+            'state': 'new',
+            'transitionAt': '2024-01-01T12:00:00+00:00'
+        }
+
+        for sequence_number in ('1', '2', '3', '1'):
+            _trigger_step_function(fake_sfn, 'arn:sm', widget_data, sequence_number)
+
+        assert len(fake_sfn.calls) == 4
+
+    def test_trigger_step_function_without_sequence_number_not_remembered(
+        self, fake_sfn
+    ):
+        """Test executions without a deterministic name are always started."""
+        widget_data = {
+            'widget_id': 'widget-123',
+            'state': 'new',
+            'transitionAt': '2024-01-01T12:00:00+00:00'
+        }
+
+        for _ in range(2):
+            _trigger_step_function(fake_sfn, 'arn:sm', widget_data)
+
+        assert len(fake_sfn.calls) == 2
+
+    def test_trigger_step_function_names_execution_by_sequence_number(
+        self, fake_sfn
+    ):
+        """Test a stream sequence number gives a deterministic execution name."""
+        widget_data = {
+            'widget_id': 'widget-123',
+            'state': 'new',
+            'transitionAt': '2024-01-01T12:00:00+00:00'
+        }
+
+        _trigger_step_function(fake_sfn, 'arn:sm', widget_data, '111')
+        _trigger_step_function(fake_sfn, 'arn:sm', widget_data, '222')
+
+        names = [call['name'] for call in fake_sfn.calls]
+        assert names[0] == _execution_name('widget-123', '111') != names[1]
+        assert re.fullmatch(r'widget-[0-9a-f]{32}', names[0])
+
+    def test_trigger_step_function_client_error(self, fake_sfn):
+        """Test Step Function trigger with ClientError."""
+        error = {'Code': 'InvalidParameterValue', 'Message': 'Invalid input'}
+        fake_sfn.responses.append(ClientError({'Error': error}, 'StartExecution'))
+
         widget_data = {
             'widget_id': 'widget-123',
             'state': 'new',
@@ -347,7 +602,7 @@ class TestTriggerStepFunction:
             StepFunctionExecutionError, match="Failed to start Step Function execution"
         ):
             _trigger_step_function(
-                mock_client,
+                fake_sfn,
                 'arn:aws:states:us-east-1:123456789012:stateMachine:test',
                 widget_data
             )
@@ -356,36 +611,13 @@ class TestTriggerStepFunction:
 class TestIntegration:
     """Integration test cases."""
 
-    @patch.dict(
-        os.environ,
-        {
-            "STEP_FUNCTION_ARN": "arn:aws:states:us-east-1:123456789012:stateMachine:sm"
-        },
-    )
-    @patch('src.lambda_handler.boto3.client')
-    def test_end_to_end_processing(self, mock_boto_client):
+    @pytest.mark.usefixtures('sfn_env')
+    def test_end_to_end_processing(self, fake_sfn, insert_record):
         """Test end-to-end processing of multiple records."""
-        mock_sfn_client = Mock()
-        mock_boto_client.return_value = mock_sfn_client
-        mock_sfn_client.start_execution.return_value = {
-            "executionArn": (
-                "arn:aws:states:us-east-1:123456789012:execution:test:test-exec"
-            )
-        }
-
         event = {
             'Records': [
                 # Valid INSERT record
-                {
-                    'eventName': 'INSERT',
-                    'dynamodb': {
-                        'NewImage': {
-                            'PK': {'S': 'widget-123'},
-                            'SK': {'S': 'new'},
-                            'transitionAt': {'N': '1704110400'}
-                        }
-                    }
-                },
+                insert_record('widget-123'),
                 # MODIFY record (should be skipped)
                 {
                     'eventName': 'MODIFY',
@@ -403,16 +635,7 @@ class TestIntegration:
                     }
                 },
                 # Another valid INSERT record
-                {
-                    'eventName': 'INSERT',
-                    'dynamodb': {
-                        'NewImage': {
-                            'PK': {'S': 'widget-789'},
-                            'SK': {'S': 'new'},
-                            'transitionAt': {'N': '1704117200'}
-                        }
-                    }
-                }
+                insert_record('widget-789', '1704117200'),
             ]
         }
 
@@ -422,5 +645,8 @@ class TestIntegration:
         assert result['processed_count'] == 2
         assert result['total_records'] == 3
         assert result['errors'] == []
-        assert mock_sfn_client.start_execution.call_count == 2
+        assert sorted(
+            json.loads(call['input'])['widget_id'] for call in fake_sfn.calls
+        ) == ['widget-123', 'widget-789']
+        assert threading.get_ident() not in fake_sfn.caller_threads
 
@@ -149,10 +149,17 @@ resource "aws_iam_policy" "lambda_dynamodb_policy" {
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:Scan",
           "dynamodb:Query"
         ]
         Resource = aws_dynamodb_table.step_alb_poc.arn
+      },
+      {
+        # Init-time connection warm-up; this action has no resource scope
+        Effect   = "Allow"
+        Action   = "dynamodb:DescribeEndpoints"
+        Resource = "*"
       }
     ]
   })
@@ -628,7 +635,8 @@ resource "aws_iam_policy" "streams_lambda_step_functions_policy" {
       {
         Effect = "Allow"
         Action = [
-          "states:StartExecution"
+          "states:StartExecution",
+          "states:DescribeStateMachine"
         ]
         Resource = aws_sfn_state_machine.widget_state_machine.arn
       }
@@ -710,6 +718,16 @@ resource "aws_lambda_event_source_mapping" "dynamodb_stream_trigger" {
   starting_position = "LATEST"
   batch_size        = 10
 
+  # Only new widget records start an execution; drop MODIFY/REMOVE records
+  # before they invoke the function
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["INSERT"]
+      })
+    }
+  }
+
   depends_on = [
     aws_lambda_function.widget_streams
   ]